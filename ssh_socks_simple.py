@@ -5,13 +5,339 @@ Uses paramiko's built-in forward functionality
 """
 
 import sys
+import os
+import argparse
+import array
+import base64
+import io
+import re
 import paramiko
 import socket
-import select
+import selectors
 import threading
+import struct
+import logging
+import queue
+import atexit
+import functools
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+log = logging.getLogger('ssh_socks_simple')
+
+# Enough for the largest greeting (2 + 255 methods) or request (4 + 1 + 255 + 2)
+HANDSHAKE_BUF = 512
+
+# Precomputed SOCKS5 replies
+REPLY_NO_AUTH = b'\x05\x00'
+REPLY_OK = b'\x05\x00\x00\x01\x00\x00\x00\x00\x00\x00'
+REPLY_FAILURE = b'\x05\x01\x00\x01\x00\x00\x00\x00\x00\x00'
+REPLY_REFUSED = b'\x05\x05\x00\x01\x00\x00\x00\x00\x00\x00'
+REPLY_CMD_UNSUPPORTED = b'\x05\x07\x00\x01\x00\x00\x00\x00\x00\x00'
+REPLY_ATYP_UNSUPPORTED = b'\x05\x08\x00\x01\x00\x00\x00\x00\x00\x00'
+
+# Relay read size, matched to the SSH channel's max packet size
+BUF = 65536
+
+# Most bytes relayed in one direction per wakeup, so one busy side can't starve the other
+DRAIN_LIMIT = 256 * 1024
+
+# Private key types to try, in order (DSSKey is gone in newer paramiko releases)
+KEY_TYPES = tuple(
+    (label, getattr(paramiko, name))
+    for label, name in (('Ed25519', 'Ed25519Key'), ('ECDSA', 'ECDSAKey'),
+                        ('RSA', 'RSAKey'), ('DSS', 'DSSKey'))
+    if hasattr(paramiko, name)
+)
+
+# PEM armour of a private key file; "BEGIN PRIVATE KEY" (PKCS#8) has no type
+KEY_HEADER_RE = re.compile(r'-----BEGIN (RSA|DSA|EC|OPENSSH) PRIVATE KEY-----')
+PEM_KEY_CLASSES = {'RSA': 'RSAKey', 'DSA': 'DSSKey', 'EC': 'ECDSAKey'}
+# Prefixes of the key type stored in an OpenSSH-format key
+OPENSSH_KEY_CLASSES = (('ssh-ed25519', 'Ed25519Key'), ('ssh-rsa', 'RSAKey'),
+                       ('ecdsa-sha2-', 'ECDSAKey'), ('ssh-dss', 'DSSKey'))
+
+# SSH channel window (overridable via --window). A larger window keeps a single
+# stream busy over high-latency links, at the cost of up to this much buffered
+# data per channel when the local client reads slower than the server sends.
+DEFAULT_WINDOW_SIZE = 8 * 1024 * 1024
+
+# Preferred ciphers/MACs, fastest first. AES-GCM runs on AES-NI through
+# cryptography/OpenSSL; names the installed paramiko doesn't offer are skipped.
+PREFERRED_CIPHERS = ('aes128-gcm@openssh.com', 'aes256-gcm@openssh.com',
+                     'chacha20-poly1305@openssh.com', 'aes128-ctr', 'aes256-ctr')
+PREFERRED_MACS = ('hmac-sha2-256-etm@openssh.com', 'hmac-sha2-256')
+# Key exchange and host key types that are cheapest to compute/verify, so the
+# handshake spends less time in asymmetric crypto (X25519 and Ed25519)
+PREFERRED_KEX = ('curve25519-sha256@libssh.org', 'curve25519-sha256',
+                 'ecdh-sha2-nistp256')
+PREFERRED_HOST_KEYS = ('ssh-ed25519', 'ecdsa-sha2-nistp256')
+
+# Lifetime of cached client-side DNS answers (--resolve-local), in seconds
+DNS_CACHE_TTL = 300
+
+# Socket buffer size for the listener and accepted clients (overridable via --sndbuf/--rcvbuf)
+DEFAULT_SOCK_BUF = 4 * 1024 * 1024
+
+# listen() backlog; the kernel still caps it at net.core.somaxconn
+LISTEN_BACKLOG = 4096
+
+# Concurrent SOCKS connections served by the worker pool (overridable via --max-conns)
+DEFAULT_MAX_CONNS = 512
+
+# Stack per thread, set process-wide with threading.stack_size() before any
+# thread starts. Relay threads are shallow, so the 8 MiB default mostly
+# reserves address space that idle connections never touch.
+WORKER_STACK_SIZE = 512 * 1024
+
+
+class _RelayPool:
+    """Relay worker threads fed from a queue, started on demand up to max_workers.
+
+    Workers are daemon threads, so a relay blocked in select() never holds
+    up interpreter exit (and the atexit cleanup behind it).
+    """
+
+    def __init__(self, max_workers, name):
+        self.max_workers = max_workers
+        self.name = name
+        self.jobs = queue.SimpleQueue()
+        self.idle = threading.Semaphore(0)  # One count per worker waiting for a job
+        self.lock = threading.Lock()
+        self.workers = 0
+        self.closed = False
+
+    def submit(self, fn, *args):
+        self.jobs.put((fn, args))
+        if self.idle.acquire(blocking=False):
+            return  # An idle worker picks it up
+        with self.lock:
+            if self.workers >= self.max_workers:
+                return
+            self.workers += 1
+            name = f'{self.name}_{self.workers}'
+        threading.Thread(target=self._work, name=name, daemon=True).start()
+
+    def _work(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            fn, args = job
+            try:
+                fn(*args)
+            except Exception:
+                log.exception("Relay worker error")
+            if self.closed:
+                return  # Started by a late submit after shutdown()
+            self.idle.release()
+
+    def shutdown(self):
+        """Let every worker exit once it finishes its current job"""
+        with self.lock:
+            self.closed = True
+            workers, self.workers = self.workers, 0
+        for _ in range(workers):
+            self.jobs.put(None)
+
+
+def _recv_exact(sock, n, view, have):
+    """Receive into view until at least n bytes are buffered.
+
+    Returns the number of buffered bytes, or -1 if the peer closed first.
+    """
+    while have < n:
+        got = sock.recv_into(view[have:])
+        if not got:
+            return -1
+        have += got
+    return have
+
+
+def _openssh_key_type(body):
+    """Key type of an openssh-key-v1 blob: the first field of its public key"""
+    blob = base64.b64decode(body)
+    if not blob.startswith(b'openssh-key-v1\0'):
+        return None
+    offset = len(b'openssh-key-v1\0')
+    # Skip ciphername, kdfname and kdfoptions, then the key count
+    for _ in range(3):
+        length, = struct.unpack_from('!I', blob, offset)
+        offset += 4 + length
+    offset += 4 + 4  # nkeys, then the public key's length prefix
+    length, = struct.unpack_from('!I', blob, offset)
+    return blob[offset + 4:offset + 4 + length].decode('ascii')
+
+
+def _sniff_key_class(data):
+    """paramiko key class for a private key file's contents, or None if it can't tell"""
+    match = KEY_HEADER_RE.search(data)
+    if not match:
+        return None
+    kind = match.group(1)
+    if kind != 'OPENSSH':
+        return getattr(paramiko, PEM_KEY_CLASSES[kind], None)
+    body = data[match.end():data.find('-----END', match.end())]
+    try:
+        key_type = _openssh_key_type(''.join(body.split()))
+    except (ValueError, struct.error, UnicodeDecodeError):
+        return None
+    for prefix, name in OPENSSH_KEY_CLASSES:
+        if key_type and key_type.startswith(prefix):
+            return getattr(paramiko, name, None)
+    return None
+
+
+def load_private_key(path):
+    """Read a private key file once and parse it with the one matching key class.
+
+    Falls back to trying every KEY_TYPES class on the same buffer when the
+    type can't be read from the header (e.g. PKCS#8).
+    """
+    with open(path) as f:
+        data = f.read()
+    key_class = _sniff_key_class(data)
+    if key_class is not None:
+        return key_class.from_private_key(io.StringIO(data))
+    errors = []
+    for label, key_class in KEY_TYPES:
+        try:
+            return key_class.from_private_key(io.StringIO(data))
+        except Exception as e:
+            errors.append(f"{label}: {e}")
+    raise paramiko.SSHException(f"Could not load SSH key. Tried: {', '.join(errors)}")
+
+
+def _prefer(current, preferred):
+    """Move the preferred names to the front of an algorithm list, keeping the rest"""
+    first = tuple(name for name in preferred if name in current)
+    return first + tuple(name for name in current if name not in first)
+
+
+def prefer_fast_ciphers():
+    """Reorder paramiko's client proposal so the server picks a hardware-accelerated
+    cipher and the cheapest key exchange and host key verification"""
+    transport_cls = paramiko.Transport
+    transport_cls._preferred_ciphers = _prefer(transport_cls._preferred_ciphers, PREFERRED_CIPHERS)
+    transport_cls._preferred_macs = _prefer(transport_cls._preferred_macs, PREFERRED_MACS)
+    transport_cls._preferred_kex = _prefer(transport_cls._preferred_kex, PREFERRED_KEX)
+    transport_cls._preferred_keys = _prefer(transport_cls._preferred_keys, PREFERRED_HOST_KEYS)
+
+
+@functools.lru_cache(maxsize=4096)
+def _resolve_cached(host, port, ttl_bucket):
+    return socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0][4][0]
+
+
+def resolve(host, port):
+    """Resolve host to a numeric address, reusing answers for up to DNS_CACHE_TTL seconds"""
+    # The bucket changes every TTL period, so stale entries stop matching and age out of the LRU
+    return _resolve_cached(host, port, int(time.monotonic() // DNS_CACHE_TTL))
+
+
+def _tune_socket(sock, sndbuf, rcvbuf):
+    """Disable Nagle and enlarge kernel buffers on a TCP socket"""
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+
+
+def _listen(local_port, sndbuf, rcvbuf, reuse_port=False):
+    """Create the local TCP listener SOCKS clients connect to"""
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        # Several listeners on one port; the kernel spreads new connections across them
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    _tune_socket(server, sndbuf, rcvbuf)
+    server.bind(('127.0.0.1', local_port))
+    server.listen(LISTEN_BACKLOG)
+    return server
+
+
+# --- Control socket: share one SSH transport between processes ---
+def connect_control(path):
+    """Connect to a running instance's control socket, or return None if there is none"""
+    ctrl = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        ctrl.connect(path)
+        return ctrl
+    except OSError:
+        ctrl.close()
+        return None
+
+
+def serve_control(path, server):
+    """Accept client sockets passed over a Unix socket (SCM_RIGHTS) and serve them on server"""
+    # Only called when connect_control() failed, so any existing file is stale
+    if os.path.exists(path):
+        os.unlink(path)
+    ctrl = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # Created 600 from the start: a chmod after bind() leaves a window in which
+    # other users could connect and have their sockets served on our transport
+    old_umask = os.umask(0o177)
+    try:
+        ctrl.bind(path)
+    finally:
+        os.umask(old_umask)
+    ctrl.listen(16)
+
+    def receive_fds(conn):
+        fd_size = array.array('i').itemsize
+        with conn:
+            while True:
+                msg, ancdata, _, _ = conn.recvmsg(1, socket.CMSG_SPACE(fd_size))
+                if not msg:
+                    return
+                for level, kind, data in ancdata:
+                    if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+                        fds = array.array('i')
+                        fds.frombytes(data[:len(data) - len(data) % fd_size])
+                        for fd in fds:
+                            server.adopt(socket.socket(fileno=fd))
+
+    def accept_loop():
+        while True:
+            conn, _ = ctrl.accept()
+            if hasattr(socket, 'SO_PEERCRED'):
+                creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+                _, uid, _ = struct.unpack('3i', creds)
+                if uid != os.getuid():
+                    log.warning("Rejected control connection from uid %d", uid)
+                    conn.close()
+                    continue
+            threading.Thread(target=receive_fds, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=accept_loop, daemon=True).start()
+    log.info("Control socket listening on %s", path)
+
+
+def forward_to_control(ctrl, local_port, sndbuf=DEFAULT_SOCK_BUF, rcvbuf=DEFAULT_SOCK_BUF):
+    """Accept SOCKS clients locally and hand each one to the instance behind ctrl.
+
+    Returns, with the listener closed, once that instance has gone away.
+    """
+    server = _listen(local_port, sndbuf, rcvbuf)
+    log.info("SOCKS proxy active on 127.0.0.1:%d (shared transport)", local_port)
+
+    with server, ctrl:
+        while True:
+            client_sock, addr = server.accept()
+            try:
+                _tune_socket(client_sock, sndbuf, rcvbuf)
+                ctrl.sendmsg([b'\0'], [(socket.SOL_SOCKET, socket.SCM_RIGHTS,
+                                        array.array('i', [client_sock.fileno()]))])
+            except (BrokenPipeError, ConnectionResetError) as e:
+                log.warning("Control socket closed, its instance exited (%s)", e)
+                return
+            finally:
+                # The receiving process holds its own duplicate of the fd
+                client_sock.close()
 
 
-def forward_tunnel(local_port, remote_host, remote_port, transport):
+def forward_tunnel(local_port, remote_host, remote_port, transport,
+                   sndbuf=DEFAULT_SOCK_BUF, rcvbuf=DEFAULT_SOCK_BUF,
+                   max_conns=DEFAULT_MAX_CONNS, listeners=1, resolve_local=False):
     """Forward a local port to remote host via SSH transport"""
 
     class ForwardServer(threading.Thread):
@@ -20,65 +346,208 @@ def forward_tunnel(local_port, remote_host, remote_port, transport):
             self.daemon = False
             self.local_port = local_port
             self.transport = transport
+            self.sndbuf = sndbuf
+            self.rcvbuf = rcvbuf
+            self.listeners = listeners
+            self.resolve_local = resolve_local
+            # Reuse worker threads; the semaphore stops accepting while all are busy
+            # so excess connections wait in the kernel backlog instead of a queue
+            self.pool = _RelayPool(max_conns, 'socks')
+            self.slots = threading.BoundedSemaphore(max_conns)
+
+            # One watcher waits for the transport thread to exit and then wakes
+            # every relay through the pipe, instead of each relay polling is_active()
+            self.transport_dead = threading.Event()
+            self.dead_r, self.dead_w = os.pipe()
+            # Relays that may still use the pipe; it is closed once stop()
+            # has been called and the last of them is done
+            self.active = 0
+            self.wake_lock = threading.Lock()
+            threading.Thread(target=self._watch_transport, daemon=True).start()
+            self.servers = []
+            self.stopping = False
+            # Set once the listeners are bound, or bind_error holds why not
+            self.ready = threading.Event()
+            self.bind_error = None
 
         def run(self):
-            # Create server socket
-            server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            server.bind(('127.0.0.1', self.local_port))
-            server.listen(100)
-
-            print(f"SOCKS proxy active on 127.0.0.1:{self.local_port}", flush=True)
-
+            # Create server sockets: one per accept thread when SO_REUSEPORT is usable
+            count = self.listeners
+            if count > 1 and (self.local_port == 0 or not hasattr(socket, 'SO_REUSEPORT')):
+                count = 1
+            servers = []
+            try:
+                for _ in range(count):
+                    servers.append(_listen(self.local_port, self.sndbuf, self.rcvbuf, reuse_port=count > 1))
+            except OSError as e:
+                # E.g. EADDRINUSE: another proxy already owns the port
+                log.error("Could not listen on 127.0.0.1:%d: %s", self.local_port, e)
+                for server in servers:
+                    server.close()
+                self.bind_error = e
+                self.ready.set()
+                return
+            self.servers = servers
+            self.ready.set()
+
+            log.info("SOCKS proxy active on 127.0.0.1:%d (%d listener%s)",
+                     self.local_port, count, '' if count == 1 else 's')
+
+            for server in servers[1:]:
+                threading.Thread(target=self._accept_loop, args=(server,), daemon=True).start()
+            self._accept_loop(servers[0])
+
+        def _accept_loop(self, server):
             while True:
+                self.slots.acquire()
                 try:
                     client_sock, addr = server.accept()
-                    # Handle in separate thread
-                    t = threading.Thread(target=self.handle_socks, args=(client_sock,))
-                    t.daemon = False
-                    t.start()
+                    _tune_socket(client_sock, self.sndbuf, self.rcvbuf)
+                    # Handle on a pooled worker thread
+                    self.pool.submit(self._serve, client_sock)
                 except Exception as e:
-                    print(f"Accept error: {e}", flush=True)
+                    self.slots.release()
+                    if not self.stopping:
+                        log.warning("Accept error: %s", e)
                     break
 
+        def stop(self):
+            """Stop accepting and close the transport (for in-process use)"""
+            self.stopping = True
+            for server in self.servers:
+                try:
+                    # shutdown() is what wakes a thread blocked in accept()
+                    server.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                server.close()
+            self.transport.close()
+            # Wake the relays now rather than when the watcher sees the transport end
+            self._wake_relays()
+            self.pool.shutdown()
+            with self.wake_lock:
+                idle = not self.active
+            if idle:
+                self._close_wake_pipe()
+
+        def _wake_relays(self):
+            with self.wake_lock:
+                if self.transport_dead.is_set():
+                    return
+                self.transport_dead.set()
+                os.write(self.dead_w, b'\0')
+
+        def _close_wake_pipe(self):
+            # Only reached with transport_dead set, so nothing writes to it any more
+            with self.wake_lock:
+                if self.dead_w is None:
+                    return
+                os.close(self.dead_r)
+                os.close(self.dead_w)
+                self.dead_w = None
+
+        def _watch_transport(self):
+            self.transport.join()
+            self._wake_relays()
+
+        def adopt(self, client_sock):
+            """Serve a client socket that was accepted by another process"""
+            self.slots.acquire()
+            try:
+                self.pool.submit(self._serve, client_sock)
+            except Exception:
+                self.slots.release()
+                raise
+
+        def _serve(self, client_sock):
+            with self.wake_lock:
+                self.active += 1
+            try:
+                self.handle_socks(client_sock)
+            finally:
+                with self.wake_lock:
+                    self.active -= 1
+                    last = self.stopping and not self.active
+                if last:
+                    self._close_wake_pipe()
+                self.slots.release()
+
         def handle_socks(self, client_sock):
             """Handle SOCKS5 connection"""
+            channel = None
             try:
-                # SOCKS5 handshake
-                data = client_sock.recv(262)
-                if len(data) < 2 or data[0] != 0x05:
-                    client_sock.close()
+                buf = bytearray(HANDSHAKE_BUF)
+                view = memoryview(buf)
+
+                # SOCKS5 greeting: VER NMETHODS METHODS...
+                have = _recv_exact(client_sock, 2, view, 0)
+                if have < 0 or buf[0] != 0x05:
                     return
+                greeting_len = 2 + buf[1]
+                have = _recv_exact(client_sock, greeting_len, view, have)
+                if have < 0:
+                    return
+
+                # Keep anything the client pipelined after the greeting
+                have -= greeting_len
+                buf[:have] = buf[greeting_len:greeting_len + have]
 
                 # No auth required
-                client_sock.send(b'\x05\x00')
+                client_sock.sendall(REPLY_NO_AUTH)
 
-                # Get connection request
-                data = client_sock.recv(4)
-                if len(data) < 4:
-                    client_sock.close()
+                # Get connection request: VER CMD RSV ATYP plus the first address byte
+                have = _recv_exact(client_sock, 5, view, have)
+                if have < 0:
                     return
 
-                if data[1] != 0x01:  # Only CONNECT supported
-                    client_sock.close()
+                ver, cmd, _, atyp = struct.unpack_from('!BBBB', buf, 0)
+                if ver != 0x05:
+                    return  # Not SOCKS5; same as a bad greeting
+                if cmd != 0x01:  # Only CONNECT supported
+                    client_sock.sendall(REPLY_CMD_UNSUPPORTED)
                     return
 
-                atyp = data[3]
-
                 # Get destination
                 if atyp == 0x01:  # IPv4
-                    addr_bytes = client_sock.recv(4)
-                    addr = socket.inet_ntoa(addr_bytes)
+                    addr_end = 8
                 elif atyp == 0x03:  # Domain
-                    addr_len = client_sock.recv(1)[0]
-                    addr = client_sock.recv(addr_len).decode('utf-8')
+                    addr_end = 5 + buf[4]
+                elif atyp == 0x04:  # IPv6
+                    addr_end = 20
                 else:
-                    client_sock.close()
+                    client_sock.sendall(REPLY_ATYP_UNSUPPORTED)
                     return
 
-                # Get port
-                port_bytes = client_sock.recv(2)
-                port = int.from_bytes(port_bytes, 'big')
+                # Address and port usually arrived with the header already
+                have = _recv_exact(client_sock, addr_end + 2, view, have)
+                if have < 0:
+                    return
+
+                if atyp == 0x01:
+                    addr = socket.inet_ntoa(buf[4:8])
+                elif atyp == 0x04:
+                    addr = socket.inet_ntop(socket.AF_INET6, buf[4:20])
+                else:
+                    name = bytes(buf[5:addr_end])
+                    # Hostnames are ASCII (IDNA); reject anything else up front
+                    if not name or not name.isascii():
+                        client_sock.sendall(REPLY_FAILURE)
+                        return
+                    addr = name.decode('ascii')
+                port, = struct.unpack_from('!H', buf, addr_end)
+                if atyp == 0x03 and self.resolve_local:
+                    try:
+                        addr = resolve(addr, port)
+                    except (OSError, UnicodeError):
+                        # Lookup failed (UnicodeError: an invalid IDNA label);
+                        # let the SSH server resolve it instead
+                        pass
+                # Payload the client sent before waiting for our reply
+                early_data = bytes(buf[addr_end + 2:have])
+
+                if self.transport_dead.is_set():
+                    client_sock.sendall(REPLY_REFUSED)
+                    return
 
                 # Open SSH channel
                 try:
@@ -89,115 +558,158 @@ def forward_tunnel(local_port, remote_host, remote_port, transport):
                     )
                 except Exception as e:
                     # Connection refused
-                    client_sock.send(b'\x05\x05\x00\x01\x00\x00\x00\x00\x00\x00')
-                    client_sock.close()
+                    client_sock.sendall(REPLY_REFUSED)
                     return
 
-                # Success
-                client_sock.send(b'\x05\x00\x00\x01\x00\x00\x00\x00\x00\x00')
-
-                # Relay data bidirectionally
-                while True:
-                    r, w, x = select.select([client_sock, channel], [], [], 1.0)
-
-                    if client_sock in r:
-                        data = client_sock.recv(8192)
-                        if len(data) == 0:
-                            break
-                        channel.send(data)
-
-                    if channel in r:
-                        data = channel.recv(8192)
-                        if len(data) == 0:
-                            break
-                        client_sock.send(data)
-
-                    # Check if transport is still active
-                    if not self.transport.is_active():
-                        break
-
-            except Exception as e:
+                # Success: build the reply in the (now free) handshake buffer and
+                # report the proxy's own endpoint as BND.ADDR/BND.PORT
+                buf[:len(REPLY_OK)] = REPLY_OK
+                if client_sock.family == socket.AF_INET:
+                    bnd_addr, bnd_port = client_sock.getsockname()
+                    struct.pack_into('!4sH', buf, 4, socket.inet_aton(bnd_addr), bnd_port)
+                client_sock.sendall(view[:len(REPLY_OK)])
+                if early_data:
+                    channel.sendall(early_data)
+
+                # Relay data bidirectionally. Both ends are registered once with
+                # epoll/kqueue instead of rebuilding fd lists on every wakeup.
+                sel = selectors.DefaultSelector()
+                sel.register(client_sock, selectors.EVENT_READ)
+                sel.register(channel, selectors.EVENT_READ)
+                sel.register(self.dead_r, selectors.EVENT_READ)
+                # Client reads land in one reusable buffer; sendall never short-writes.
+                # splice(2) can't be used here: channel.fileno() is only a readiness
+                # pipe, and the payload has to pass through paramiko to be encrypted.
+                relay_buf = bytearray(BUF)
+                relay_view = memoryview(relay_buf)
+                # EOF from one side is passed on as a half-close; the other
+                # direction keeps draining until it reaches EOF too
+                client_eof = channel_eof = False
+                try:
+                    while not (client_eof and channel_eof):
+                        for key, _ in sel.select():
+                            if key.fileobj == self.dead_r:
+                                return
+                            # Drain whatever is already queued (up to DRAIN_LIMIT)
+                            # before going back to the selector. The while/else
+                            # branch runs only when a read returned EOF.
+                            drained = 0
+                            if key.fileobj is client_sock:
+                                n = client_sock.recv_into(relay_buf)
+                                while n:
+                                    channel.sendall(relay_view[:n])
+                                    drained += n
+                                    if drained >= DRAIN_LIMIT:
+                                        break
+                                    try:
+                                        n = client_sock.recv_into(relay_buf, 0, socket.MSG_DONTWAIT)
+                                    except BlockingIOError:
+                                        break
+                                else:
+                                    client_eof = True
+                                    sel.unregister(client_sock)
+                                    channel.shutdown_write()
+                            else:
+                                # paramiko channels have no recv_into; recv_ready()
+                                # is a buffer check, not a syscall
+                                data = channel.recv(BUF)
+                                while data:
+                                    client_sock.sendall(data)
+                                    drained += len(data)
+                                    if drained >= DRAIN_LIMIT or not channel.recv_ready():
+                                        break
+                                    data = channel.recv(BUF)
+                                else:
+                                    channel_eof = True
+                                    sel.unregister(channel)
+                                    client_sock.shutdown(socket.SHUT_WR)
+                finally:
+                    sel.close()
+
+            except OSError:
+                # Peer reset or channel closed mid-relay
                 pass
             finally:
-                try:
-                    client_sock.close()
-                except:
-                    pass
-                try:
+                client_sock.close()
+                if channel is not None:
                     channel.close()
-                except:
-                    pass
 
     return ForwardServer(local_port, transport)
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 6 or len(sys.argv) > 7:
-        print("Usage: ssh_socks_simple.py <host> <port> <user> <password|key_path> <local_port> [auth_method]")
-        print("  auth_method: 'password' (default) or 'key'")
-        sys.exit(1)
-
-    host = sys.argv[1]
-    port = int(sys.argv[2])
-    user = sys.argv[3]
-    auth_credential = sys.argv[4]
-    local_port = int(sys.argv[5])
-    auth_method = sys.argv[6] if len(sys.argv) == 7 else 'password'
+    parser = argparse.ArgumentParser(description="SSH dynamic port forward (SOCKS5) using paramiko")
+    parser.add_argument('host')
+    parser.add_argument('port', type=int)
+    parser.add_argument('user')
+    parser.add_argument('auth_credential', metavar='password|key_path')
+    parser.add_argument('local_port', type=int)
+    parser.add_argument('auth_method', nargs='?', default='password',
+                        help="'password' (default) or 'key'")
+    parser.add_argument('--sndbuf', type=int, default=DEFAULT_SOCK_BUF,
+                        help="SO_SNDBUF for SOCKS sockets in bytes (default: %(default)s)")
+    parser.add_argument('--rcvbuf', type=int, default=DEFAULT_SOCK_BUF,
+                        help="SO_RCVBUF for SOCKS sockets in bytes (default: %(default)s)")
+    parser.add_argument('--window', type=int, default=DEFAULT_WINDOW_SIZE,
+                        help="SSH channel window size in bytes (default: %(default)s)")
+    # One listener by default: with SO_REUSEPORT a stale second instance on the
+    # port would silently share clients instead of failing with EADDRINUSE
+    parser.add_argument('--listeners', type=int, default=1,
+                        help="Accept threads on the SOCKS port; more than 1 enables SO_REUSEPORT "
+                             "(default: %(default)s)")
+    parser.add_argument('--resolve-local', action='store_true',
+                        help="Resolve SOCKS hostnames locally (cached) instead of on the SSH server")
+    parser.add_argument('--control-path', metavar='PATH',
+                        help="Unix socket for sharing one SSH transport between instances")
+    parser.add_argument('--max-conns', type=int, default=DEFAULT_MAX_CONNS,
+                        help="Maximum concurrent SOCKS connections (default: %(default)s)")
+    args = parser.parse_args()
+
+    threading.stack_size(WORKER_STACK_SIZE)  # Before the first thread starts
+
+    # Log through a queue so relay/accept threads never block on stdout writes
+    log_queue = queue.Queue()
+    log_listener = QueueListener(log_queue, logging.StreamHandler(sys.stdout))
+    logging.basicConfig(level=logging.INFO, format='%(message)s', handlers=[QueueHandler(log_queue)])
+    log_listener.start()
+    atexit.register(log_listener.stop)
+
+    host = args.host
+    port = args.port
+    user = args.user
+    auth_credential = args.auth_credential
+    local_port = args.local_port
+    auth_method = args.auth_method
 
     try:
-        print(f"Connecting to {host}:{port}...", flush=True)
+        # Another instance already holds an SSH transport: pass our clients to it
+        ctrl = connect_control(args.control_path) if args.control_path else None
+        if ctrl:
+            log.info("Reusing SSH transport via %s", args.control_path)
+            forward_to_control(ctrl, local_port, sndbuf=args.sndbuf, rcvbuf=args.rcvbuf)
+            log.info("Shared transport is gone; connecting over SSH directly")
+
+        log.info("Connecting to %s:%d...", host, port)
 
         # Connect SSH
+        prefer_fast_ciphers()
         ssh = paramiko.SSHClient()
         ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
 
         if auth_method == 'key':
             # SSH key authentication
-            import os
             key_path = os.path.expanduser(auth_credential)
 
             if not os.path.exists(key_path):
-                print(f"SSH key not found: {key_path}", flush=True)
+                log.error("SSH key not found: %s", key_path)
                 sys.exit(1)
 
-            # Try loading different key types
-            key = None
-            key_errors = []
-
-            # Try RSA
             try:
-                key = paramiko.RSAKey.from_private_key_file(key_path)
-                print(f"Using RSA key: {key_path}", flush=True)
+                key = load_private_key(key_path)
             except Exception as e:
-                key_errors.append(f"RSA: {e}")
-
-            # Try Ed25519
-            if not key:
-                try:
-                    key = paramiko.Ed25519Key.from_private_key_file(key_path)
-                    print(f"Using Ed25519 key: {key_path}", flush=True)
-                except Exception as e:
-                    key_errors.append(f"Ed25519: {e}")
-
-            # Try DSS
-            if not key:
-                try:
-                    key = paramiko.DSSKey.from_private_key_file(key_path)
-                    print(f"Using DSS key: {key_path}", flush=True)
-                except Exception as e:
-                    key_errors.append(f"DSS: {e}")
-
-            # Try ECDSA
-            if not key:
-                try:
-                    key = paramiko.ECDSAKey.from_private_key_file(key_path)
-                    print(f"Using ECDSA key: {key_path}", flush=True)
-                except Exception as e:
-                    key_errors.append(f"ECDSA: {e}")
-
-            if not key:
-                print(f"Could not load SSH key. Tried: {', '.join(key_errors)}", flush=True)
+                log.error("%s", e)
                 sys.exit(1)
+            log.info("Using %s key: %s", key.get_name(), key_path)
 
             ssh.connect(
                 hostname=host,
@@ -218,16 +730,24 @@ if __name__ == "__main__":
 
         transport = ssh.get_transport()
         transport.set_keepalive(10)
+        # Window/packet size advertised on every channel opened from here on
+        transport.default_window_size = args.window
+        transport.default_max_packet_size = BUF
 
-        print(f"SSH connected", flush=True)
+        log.info("SSH connected")
 
         # Start forward server
-        server = forward_tunnel(local_port, host, port, transport)
+        server = forward_tunnel(local_port, host, port, transport,
+                                sndbuf=args.sndbuf, rcvbuf=args.rcvbuf,
+                                max_conns=args.max_conns, listeners=args.listeners,
+                                resolve_local=args.resolve_local)
         server.start()
+        if args.control_path:
+            serve_control(args.control_path, server)
 
         # Keep main thread alive
         server.join()
 
     except Exception as e:
-        print(f"Error: {e}", flush=True)
+        log.error("Error: %s", e)
         sys.exit(1)
@@ -5,17 +5,23 @@ Tabs at bottom, compact layout, HUGE animations!
 """
 
 import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext, simpledialog, filedialog
+import tkinter.font as tkfont
+from tkinter import messagebox, scrolledtext, simpledialog, filedialog
 import threading
 import subprocess
 import time
 import os
 import json
 import math
+import functools
+import re
 import socket
 import sys
+import importlib.util
 from pathlib import Path
 from datetime import datetime
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 # Add potential library locations to sys.path for robust import
 # This helps if the app is run directly without the wrapper script
@@ -49,14 +55,18 @@ except ImportError as e:
 
 
 try:
-    import pystray
-    from PIL import Image, ImageDraw
-    TRAY_AVAILABLE = True
+    import orjson  # Optional: faster profile (de)serialization
 except ImportError:
-    TRAY_AVAILABLE = False
+    orjson = None
+
+# pystray/PIL are only imported once the tray is actually set up
+TRAY_AVAILABLE = all(importlib.util.find_spec(name) for name in ('pystray', 'PIL'))
+if not TRAY_AVAILABLE:
     print("Warning: pystray not installed (system tray disabled)")
 
 # ===== COLORS =====
+# Canonical #rrggbb strings: Tk parses each distinct colour once per display and
+# caches it internally, so widgets take these directly (no winfo_rgb round-trips).
 COLORS = {
     'bg_dark': '#1a1d29',
     'bg_card': '#252936',
@@ -70,17 +80,204 @@ COLORS = {
     'text_gray': '#9ca3af',
     'text_dark': '#6b7280',
 }
+# Interned so every widget shares one string object per colour
+COLORS = {name: sys.intern(value.lower()) for name, value in COLORS.items()}
+
+@functools.lru_cache(maxsize=None)
+def ui_font(size, weight='normal', family='Segoe UI'):
+    """Shared named font, so Tk parses each font description only once.
+    Needs a Tk root, so only call it while building widgets."""
+    return tkfont.Font(family=family, size=size, weight=weight)
+
+
+# Styling for the fixed-choice menus in the profile editor, built once
+OPTION_MENU_STYLE = {
+    'bg': COLORS['bg_input'],
+    'fg': COLORS['text_white'],
+    'activebackground': COLORS['bg_lighter'],
+    'activeforeground': COLORS['text_white'],
+    'relief': 'flat',
+    'bd': 0,
+    'highlightthickness': 0,
+    'anchor': 'w',
+}
+OPTION_MENU_LIST_STYLE = {
+    'bg': COLORS['bg_input'],
+    'fg': COLORS['text_white'],
+    'activebackground': COLORS['accent_blue'],
+    'activeforeground': COLORS['text_white'],
+    'bd': 0,
+}
+
+# Sine lookup tables for the connect button animations, one full period each
+PULSE_STEPS = 42  # ~0.15 rad per frame
+GLOW_STEPS = 63   # ~0.1 rad per frame
+PULSE_SIN = tuple(math.sin(2 * math.pi * i / PULSE_STEPS) for i in range(PULSE_STEPS))
+GLOW_SIN = tuple(math.sin(2 * math.pi * i / GLOW_STEPS) for i in range(GLOW_STEPS))
+
+# How often the data counter and UDP gateway status are refreshed
+STATS_INTERVAL_MS = 5000
+
+def tcp_latency(host, port, samples=3, timeout=2):
+    """Round-trip times in ms of TCP connects to host:port (no ping subprocess)"""
+    family, socktype, proto, _, address = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0]
+    rtts = []
+    for _ in range(samples):
+        sock = socket.socket(family, socktype, proto)
+        sock.settimeout(timeout)
+        try:
+            start = time.perf_counter()
+            sock.connect(address)
+            rtts.append((time.perf_counter() - start) * 1000)
+        finally:
+            sock.close()
+    return rtts
+
+
+# Summary line of `ping -c`, e.g. "rtt min/avg/max/mdev = 1.0/2.0/3.0/0.5 ms"
+PING_RTT_RE = re.compile(r'rtt min/avg/max/mdev = ([\d.]+)/([\d.]+)/([\d.]+)/([\d.]+)')
+
+# Profile fields used to connect, with their defaults
+PROFILE_FIELDS = (
+    ('protocol', 'SSH'),
+    ('host', ''),
+    ('port', '22'),
+    ('username', ''),
+    ('auth_method', 'Password'),
+    ('password', ''),
+    ('ssh_key_path', ''),
+    ('udpgw_port', '7300'),
+    ('sni_domain', 'www.google.com'),
+    ('tls_port', '443'),
+    ('dns_servers', '8.8.8.8, 8.8.4.4'),
+)
+
+# After this many good udpgw probes in a row, only probe every Nth sample
+UDPGW_STABLE_PROBES = 3
+UDPGW_STABLE_EVERY = 3
+
+# Seconds to keep retrying SSH through a freshly started stunnel
+STUNNEL_READY_TIMEOUT = 5
+
+# Lines kept in the activity log; older entries drop off the top
+LOG_MAX_LINES = 2000
+
+# Table steps per second, so motion speed is independent of the frame rate
+PULSE_STEPS_PER_SEC = 1000 / 30
+GLOW_STEPS_PER_SEC = 1000 / 50
+
+
+def _scroll_canvas(event):
+    """Mouse wheel handler shared by every canvas tagged 'ScrollCanvas'"""
+    if event.num == 4:
+        step = -1
+    elif event.num == 5:
+        step = 1
+    else:
+        step = int(-1*(event.delta/120))
+    event.widget.yview_scroll(step, "units")
+
+
+# ===== TRAY ICON =====
+TRAY_COLORS = {
+    'disconnected': (79, 124, 255),    # Blue
+    'connecting': (255, 159, 67),      # Orange
+    'connected': (0, 224, 150)          # Green
+}
+
+
+def create_tray_icon_image(color):
+    """Create VPN shield icon"""
+    from PIL import Image, ImageDraw
+    img = Image.new('RGB', (64, 64), color=(0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    # Draw shield
+    draw.polygon([(32, 10), (50, 18), (50, 40), (32, 54), (14, 40), (14, 18)],
+                fill=color, outline=(255, 255, 255))
+    return img
+
+
+# ===== FRAME TICKER =====
+class FrameTicker:
+    """Single Tk timer that drives every running animation"""
+
+    # Seconds; a frame this slow or this late means Tk is backlogged
+    SKIP_THRESHOLD = 0.05
+    # Seconds; a frame this slow backs off for a while before drawing again
+    STALL_THRESHOLD = 0.5
+
+    def __init__(self, widget, fps=30):
+        self.widget = widget
+        self.fps = fps
+        self.subscribers = []
+        self.after_id = None
+        self.last_frame = time.perf_counter()
+        self.next_due = self.last_frame
+        self.skip_next = False
+
+    def subscribe(self, callback):
+        """Call callback(elapsed_seconds) on every frame until unsubscribed"""
+        if callback in self.subscribers:
+            return
+        self.subscribers.append(callback)
+        if self.after_id is None:
+            self.last_frame = time.perf_counter()
+            self.skip_next = False
+            self._schedule(1)
+
+    def unsubscribe(self, callback):
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+        if not self.subscribers and self.after_id is not None:
+            self.widget.after_cancel(self.after_id)
+            self.after_id = None
+
+    def _schedule(self, delay):
+        self.next_due = time.perf_counter() + delay / 1000
+        self.after_id = self.widget.after(delay, self._tick)
+
+    def _tick(self):
+        frame_start = time.perf_counter()
+        frame_ms = int(1000 / self.fps)
+
+        # Behind schedule: let Tk catch up instead of queueing more drawing.
+        # last_frame is left alone so the next drawn frame covers the gap.
+        if self.skip_next or frame_start - self.next_due > self.SKIP_THRESHOLD:
+            self.skip_next = False
+            self._schedule(frame_ms)
+            return
+
+        elapsed = frame_start - self.last_frame
+        self.last_frame = frame_start
+
+        for callback in tuple(self.subscribers):
+            callback(elapsed)
+
+        if not self.subscribers:
+            self.after_id = None
+            return
+
+        cost = time.perf_counter() - frame_start
+        if cost > self.STALL_THRESHOLD:
+            self._schedule(int(self.STALL_THRESHOLD * 1000))
+            return
+        self.skip_next = cost > self.SKIP_THRESHOLD
+        # Drawing time counts against the frame budget
+        self._schedule(max(1, frame_ms - int(cost * 1000)))
 
 
 # ===== HUGE ANIMATED BUTTON =====
 class HugeConnectButton(tk.Canvas):
     """Massive animated connect button"""
 
-    def __init__(self, parent, command=None, **kwargs):
+    ROTATION_FRAMES = ('●', '◐', '◑', '◒', '◓')
+
+    def __init__(self, parent, command=None, ticker=None, **kwargs):
         super().__init__(parent, width=180, height=180,
                         bg=COLORS['bg_card'], highlightthickness=0, **kwargs)
 
         self.command = command
+        self.ticker = ticker or FrameTicker(self)
         self.is_connected = False
         self.is_connecting = False
 
@@ -109,7 +306,7 @@ class HugeConnectButton(tk.Canvas):
         # Icon
         self.power_icon = self.create_text(
             self.center_x, self.center_y,
-            text="⚡", font=('Segoe UI', 42),
+            text="⚡", font=ui_font(42),
             fill=COLORS['text_white']
         )
 
@@ -117,9 +314,26 @@ class HugeConnectButton(tk.Canvas):
         self.tag_bind(self.button_circle, '<Button-1>', self._on_click)
         self.tag_bind(self.power_icon, '<Button-1>', self._on_click)
 
-        self.pulse_angle = 0
-        self.glow_size = 0
-        self.animation_id = None
+        # Oval bounds for every pulse step; geometry is fixed, so the
+        # per-frame work is a single table lookup
+        self.pulse_coords = tuple(
+            (self.center_x - r, self.center_y - r,
+             self.center_x + r, self.center_y + r)
+            for r in (self.radius * (1.0 + 0.15 * s) for s in PULSE_SIN)
+        )
+
+        # Per-frame updates go straight to Tcl, skipping the Canvas wrappers'
+        # option flattening and name resolution
+        self.tkcall = self.tk.call
+        self.path = self._w
+
+        self.pulse_phase = 0.0
+        self.glow_phase = 0.0
+        # Last values sent to Tk, so unchanged items aren't reconfigured every frame
+        self.last_pulse_step = None
+        self.last_icon_index = None
+        self.last_glow_width = None
+        self.paused = False
 
     def _on_click(self, event=None):
         if self.command:
@@ -148,13 +362,34 @@ class HugeConnectButton(tk.Canvas):
         self.itemconfig(self.button_circle, fill=COLORS['accent_blue'])
         self.itemconfig(self.power_icon, text="⚡")
 
+    def pause_animations(self):
+        """Stop scheduling frames while the button is not on screen"""
+        self.paused = True
+        self._cancel_frame()
+
+    def resume_animations(self):
+        """Restart whichever animation matches the current state"""
+        if not self.paused:
+            return
+        self.paused = False
+        if self.is_connecting:
+            self._start_pulse()
+        elif self.is_connected:
+            self._start_glow()
+
+    def _cancel_frame(self):
+        self.ticker.unsubscribe(self._animate_pulse)
+        self.ticker.unsubscribe(self._animate_glow)
+
     def _start_pulse(self):
-        self._animate_pulse()
+        self._cancel_frame()
+        self.last_pulse_step = None
+        self.last_icon_index = None
+        if not self.paused:
+            self.ticker.subscribe(self._animate_pulse)
 
     def _stop_pulse(self):
-        if self.animation_id:
-            self.after_cancel(self.animation_id)
-            self.animation_id = None
+        self._cancel_frame()
         self.coords(
             self.button_circle,
             self.center_x - self.radius,
@@ -164,64 +399,73 @@ class HugeConnectButton(tk.Canvas):
         )
 
     def _start_glow(self):
-        self._animate_glow()
+        self._cancel_frame()
+        self.last_glow_width = None
+        self.itemconfig(self.glow_circle, outline=COLORS['accent_green'])
+        if not self.paused:
+            self.ticker.subscribe(self._animate_glow)
 
     def _stop_glow(self):
-        if self.animation_id:
-            self.after_cancel(self.animation_id)
-            self.animation_id = None
+        self._cancel_frame()
         self.itemconfig(self.glow_circle, width=0)
 
-    def _animate_pulse(self):
-        if not self.is_connecting:
-            return
-
-        self.pulse_angle += 0.15
-        scale = 1.0 + 0.15 * math.sin(self.pulse_angle)
+    def _animate_pulse(self, elapsed):
+        self.pulse_phase += elapsed * PULSE_STEPS_PER_SEC
+        step = int(self.pulse_phase) % PULSE_STEPS
+        if step != self.last_pulse_step:
+            self.last_pulse_step = step
+            self.tkcall(self.path, 'coords', self.button_circle, *self.pulse_coords[step])
 
-        r = self.radius * scale
-        self.coords(
-            self.button_circle,
-            self.center_x - r,
-            self.center_y - r,
-            self.center_x + r,
-            self.center_y + r
-        )
+        # Icon advances by 0.3 of a frame per table step (one step every ~100ms)
+        frame_index = int(self.pulse_phase * 0.3) % len(self.ROTATION_FRAMES)
+        if frame_index != self.last_icon_index:
+            self.last_icon_index = frame_index
+            self.tkcall(self.path, 'itemconfigure', self.power_icon, '-text', self.ROTATION_FRAMES[frame_index])
 
-        rotation_frames = ['●', '◐', '◑', '◒', '◓']
-        frame_index = int(self.pulse_angle * 2) % len(rotation_frames)
-        self.itemconfig(self.power_icon, text=rotation_frames[frame_index])
-
-        self.animation_id = self.after(30, self._animate_pulse)
-
-    def _animate_glow(self):
-        if not self.is_connected:
-            return
-
-        self.glow_size += 0.1
-        width = 4 + 3 * math.sin(self.glow_size)
-        self.itemconfig(self.glow_circle, width=int(width), outline=COLORS['accent_green'])
-        self.animation_id = self.after(50, self._animate_glow)
+    def _animate_glow(self, elapsed):
+        self.glow_phase += elapsed * GLOW_STEPS_PER_SEC
+        width = int(4 + 3 * GLOW_SIN[int(self.glow_phase) % GLOW_STEPS])
+        if width != self.last_glow_width:
+            self.last_glow_width = width
+            self.tkcall(self.path, 'itemconfigure', self.glow_circle, '-width', width)
 
 
 # ===== SINGLE INSTANCE LOCK =====
 class SingleInstance:
     """Ensure only one instance of the app runs"""
 
-    def __init__(self, port=47285):
-        self.port = port
+    def __init__(self, name='ssh_vpn_pro'):
+        self.name = name
         self.socket = None
+        self.lock_fd = None
 
     def acquire(self):
         """Try to acquire lock. Returns True if successful."""
+        if sys.platform.startswith('linux'):
+            # Abstract unix socket: no filesystem entry, no firewall prompt,
+            # and the kernel drops the name as soon as the process dies
+            try:
+                self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self.socket.bind(f'\0{self.name}_{os.getuid()}')
+                return True
+            except OSError:
+                self.socket.close()
+                self.socket = None
+                return False
+
         try:
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self.socket.bind(('127.0.0.1', self.port))
-            self.socket.listen(1)  # Must call listen() to actually hold the port
+            import fcntl
+            # Per-user runtime dir (tmpfs) when there is one; O_CREAT without
+            # O_TRUNC, so checking the lock never rewrites the file
+            lock_dir = os.environ.get('XDG_RUNTIME_DIR') or Path.home()
+            self.lock_fd = os.open(Path(lock_dir) / f'.{self.name}.lock', os.O_CREAT | os.O_RDWR, 0o600)
+            fcntl.flock(self.lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
             return True
         except OSError:
-            # Port already in use - another instance is running
+            # Lock held by another instance
+            if self.lock_fd is not None:
+                os.close(self.lock_fd)
+                self.lock_fd = None
             return False
 
     def release(self):
@@ -231,6 +475,11 @@ class SingleInstance:
                 self.socket.close()
             except:
                 pass
+        if self.lock_fd is not None:
+            # Closing the descriptor drops the flock
+            os.close(self.lock_fd)
+        self.socket = None
+        self.lock_fd = None
 
 
 # ===== MAIN APP =====
@@ -250,7 +499,6 @@ class SSHVPNPro:
             )
             temp_root.quit()
             temp_root.destroy()
-            import sys
             sys.exit(1)
 
         self.root = tk.Tk()
@@ -260,6 +508,10 @@ class SSHVPNPro:
         self.root.geometry("400x700")
         self.root.resizable(False, False)
         self.root.configure(bg=COLORS['bg_dark'])
+        self._register_widget_defaults()
+        # One class binding serves all scrollable canvases
+        for sequence in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            self.root.bind_class('ScrollCanvas', sequence, _scroll_canvas)
 
         # State
         self.connected = False
@@ -269,27 +521,57 @@ class SSHVPNPro:
         self.current_profile = None
         self.profiles_file = Path.home() / '.ssh_vpn_profiles.json'
         self.vpn_info = None # Holds info from vpn_core for cleanup
+        self.cleanup_future = None  # Background disconnect, until it finishes
 
-        # Security: Ensure profile file has secure permissions on load
-        if self.profiles_file.exists():
-            os.chmod(self.profiles_file, 0o600)
+        # Security: Ensure profile file has secure permissions on load. Files we
+        # write are created 600 already, so this only fixes up older ones.
+        try:
+            if self.profiles_file.stat().st_mode & 0o077:
+                os.chmod(self.profiles_file, 0o600)
+        except FileNotFoundError:
+            pass
         self.connection_start_time = None
         self.uptime_timer = None
-        self.current_tab = 'home'
+        self.net_timer = None
+        self.udp_ok_streak = 0  # Consecutive probes that found udpgw listening
+        self.udp_probe_countdown = 0  # Samples left until the next udpgw probe
+        self.current_tab = None  # Set by the first switch_tab() in setup_ui
+        self.window_visible = True
         self.tray_icon = None
+        self.tray_status = 'disconnected'
+        # No point drawing a tray icon without a display, or if the user opted out
+        self.tray_enabled = (TRAY_AVAILABLE
+                             and not os.environ.get('SSH_VPN_PRO_NO_TRAY')
+                             and bool(os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY')))
         self.initial_rx_bytes = 0
         self.initial_tx_bytes = 0
+        self.stats_fds = None  # Open tun0 counter files while connected
+        self.label_state = {}  # Widget path -> options last sent by _set_label
+        self.log_lines = deque(maxlen=LOG_MAX_LINES)
+        self.log_pending = []  # Lines not yet in the log widget
+        self.log_flush_pending = False
+        self.log_lock = threading.Lock()
+        self.cards_rebuild_pending = False
+        self.profile_cards = {}  # Profile name -> widgets of its card
+        self.profiles_empty_label = None
+        self.profiles_dirty = False
+        self.ticker = FrameTicker(self.root)
+        # Blocking vpn_core work (connect, cleanup, status probes) runs here
+        # so the Tk loop and the button animations never stall on it
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='vpn-worker')
 
         self.load_profiles()
         self.setup_ui()
-        self.setup_tray_icon()
         self.center_window()
+        # Let the window paint before paying for the PIL/pystray imports
+        if self.tray_enabled:
+            self.root.after(500, self.setup_tray_icon)
 
     def setup_ui(self):
         """Setup mobile-style UI with bottom tabs"""
 
         # Main container
-        main_container = tk.Frame(self.root, bg=COLORS['bg_dark'])
+        main_container = tk.Frame(self.root, class_='Themed', bg=COLORS['bg_dark'])
         main_container.pack(fill=tk.BOTH, expand=True)
 
         # Content area (fills most of screen)
@@ -311,21 +593,23 @@ class SSHVPNPro:
             ('about', '👤', 'About')
         ]
 
+        card_bg = COLORS['bg_card']
+        gray = COLORS['text_gray']
+        blue = COLORS['accent_blue']
+        white = COLORS['text_white']
         for i, (key, icon, label) in enumerate(tabs):
-            btn_frame = tk.Frame(tab_bar, bg=COLORS['bg_card'])
+            btn_frame = tk.Frame(tab_bar, bg=card_bg)
             btn_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
             btn = tk.Button(
                 btn_frame,
                 text=f"{icon}\n{label}",
-                font=('Segoe UI', 10),
-                bg=COLORS['bg_card'],
-                fg=COLORS['text_gray'],
-                activebackground=COLORS['accent_blue'],
-                activeforeground=COLORS['text_white'],
-                relief='flat',
+                font=ui_font(10),
+                bg=card_bg,
+                fg=gray,
+                activebackground=blue,
+                activeforeground=white,
                 bd=0,
-                cursor='hand2',
                 padx=5,
                 pady=8,
                 command=lambda k=key: self.switch_tab(k)
@@ -333,14 +617,49 @@ class SSHVPNPro:
             btn.pack(fill=tk.BOTH, expand=True)
             self.tab_buttons[key] = btn
 
-        # Create tab contents
+        # Create tab contents: Home now, the rest on first visit
         self.create_home_tab()
-        self.create_config_tab()
-        self.create_logs_tab()
-        self.create_about_tab()
+        self.built_tabs = {'home'}
+        self.tab_builders = {
+            'config': self.create_config_tab,
+            'logs': self.create_logs_tab,
+            'about': self.create_about_tab,
+        }
 
         # Show home
         self.switch_tab('home')
+        self.log("✨ SSH VPN Pro initialized")
+
+        # Pause the connect button animations while minimized or hidden to tray
+        self.root.bind('<Map>', self._on_root_map, add='+')
+        self.root.bind('<Unmap>', self._on_root_map, add='+')
+
+    def _register_widget_defaults(self):
+        """Shared widget colours/relief, resolved once through the Tk option database"""
+        # Scoped to 'Themed' containers so stock dialogs keep their native look
+        for pattern, value in (
+            ('*Themed*Button.foreground', COLORS['text_white']),
+            ('*Themed*Button.relief', 'flat'),
+            ('*Themed*Button.cursor', 'hand2'),
+            ('*Themed*Entry.background', COLORS['bg_input']),
+            ('*Themed*Entry.foreground', COLORS['text_white']),
+            ('*Themed*Entry.relief', 'flat'),
+            ('*Themed*Entry.borderWidth', 0),
+        ):
+            self.root.option_add(pattern, value)
+
+    def _on_root_map(self, event):
+        # Child widgets inherit the root's bindings; only the toplevel matters here
+        if event.widget is self.root:
+            self.window_visible = event.type == tk.EventType.Map
+            self._update_animation_state()
+
+    def _update_animation_state(self):
+        """Only animate the connect button while it can actually be seen"""
+        if self.current_tab == 'home' and self.window_visible:
+            self.connect_button.resume_animations()
+        else:
+            self.connect_button.pause_animations()
 
     def create_home_tab(self):
         """Home/Dashboard tab"""
@@ -351,21 +670,21 @@ class SSHVPNPro:
         header.pack(fill=tk.X, padx=20, pady=(20, 10))
 
         tk.Label(header, text="SSH VPN Pro",
-                font=('Segoe UI', 20, 'bold'),
+                font=ui_font(20, 'bold'),
                 bg=COLORS['bg_dark'],
                 fg=COLORS['text_white']).pack()
 
         # Status
         self.status_label = tk.Label(self.home_frame,
                                      text="Not Connected",
-                                     font=('Segoe UI', 16, 'bold'),
+                                     font=ui_font(16, 'bold'),
                                      bg=COLORS['bg_dark'],
                                      fg=COLORS['text_gray'])
         self.status_label.pack(pady=5)
 
         self.status_subtitle = tk.Label(self.home_frame,
                                         text="Tap to connect",
-                                        font=('Segoe UI', 11),
+                                        font=ui_font(11),
                                         bg=COLORS['bg_dark'],
                                         fg=COLORS['text_dark'])
         self.status_subtitle.pack(pady=(0, 5))
@@ -373,13 +692,14 @@ class SSHVPNPro:
         # Current profile name
         self.profile_label = tk.Label(self.home_frame,
                                       text="No profile selected",
-                                      font=('Segoe UI', 10),
+                                      font=ui_font(10),
                                       bg=COLORS['bg_dark'],
                                       fg=COLORS['accent_blue'])
         self.profile_label.pack(pady=(0, 10))
 
         # HUGE button
-        self.connect_button = HugeConnectButton(self.home_frame, command=self.toggle_connection)
+        self.connect_button = HugeConnectButton(self.home_frame, command=self.toggle_connection,
+                                                ticker=self.ticker)
         self.connect_button.pack(pady=10)
 
         # Stats
@@ -396,11 +716,8 @@ class SSHVPNPro:
         actions.pack(fill=tk.X, padx=20, pady=10)
 
         tk.Button(actions, text="📡 Ping Server",
-                 font=('Segoe UI', 10),
+                 font=ui_font(10),
                  bg=COLORS['bg_lighter'],
-                 fg=COLORS['text_white'],
-                 relief='flat',
-                 cursor='hand2',
                  command=self.ping_server).pack(fill=tk.X, ipady=8)
 
     def create_stat_row(self, parent, icon, label, value, key):
@@ -408,17 +725,34 @@ class SSHVPNPro:
         row = tk.Frame(parent, bg=COLORS['bg_lighter'])
         row.pack(fill=tk.X, pady=3)
 
-        tk.Label(row, text=icon, font=('Segoe UI', 14),
+        tk.Label(row, text=icon, font=ui_font(14),
                 bg=COLORS['bg_lighter'], fg=COLORS['text_gray']).pack(side=tk.LEFT, padx=(10, 5))
 
-        tk.Label(row, text=label, font=('Segoe UI', 10),
+        tk.Label(row, text=label, font=ui_font(10),
                 bg=COLORS['bg_lighter'], fg=COLORS['text_dark']).pack(side=tk.LEFT)
 
-        value_label = tk.Label(row, text=value, font=('Segoe UI', 10, 'bold'),
+        value_label = tk.Label(row, text=value, font=ui_font(10, 'bold'),
                               bg=COLORS['bg_lighter'], fg=COLORS['text_white'])
         value_label.pack(side=tk.RIGHT, padx=10)
 
         setattr(self, f'{key}_value', value_label)
+        self.label_state[str(value_label)] = {'text': value}
+
+    def set_stat(self, key, text, fg=None):
+        """Update a stat row value"""
+        self._set_label(getattr(self, f'{key}_value'), text, fg)
+
+    def _set_label(self, widget, text=None, fg=None):
+        """Configure a label, sending Tk only the options whose value changed"""
+        last = self.label_state.setdefault(str(widget), {})
+        changed = {}
+        if text is not None and last.get('text') != text:
+            changed['text'] = text
+        if fg is not None and last.get('fg') != fg:
+            changed['fg'] = fg
+        if changed:
+            last.update(changed)
+            widget.config(**changed)
 
     def create_config_tab(self):
         """Modern Config tab - Profile cards only (editor in pop-up)"""
@@ -429,16 +763,13 @@ class SSHVPNPro:
         header.pack(fill=tk.X, padx=15, pady=15)
 
         tk.Label(header, text="Profiles",
-                font=('Segoe UI', 20, 'bold'),
+                font=ui_font(20, 'bold'),
                 bg=COLORS['bg_dark'],
                 fg=COLORS['text_white']).pack(side=tk.LEFT)
 
         tk.Button(header, text="+ New",
-                 font=('Segoe UI', 11, 'bold'),
+                 font=ui_font(11, 'bold'),
                  bg=COLORS['accent_blue'],
-                 fg=COLORS['text_white'],
-                 relief='flat',
-                 cursor='hand2',
                  padx=15,
                  pady=5,
                  command=self.new_profile).pack(side=tk.RIGHT)
@@ -448,7 +779,7 @@ class SSHVPNPro:
         cards_frame.pack(fill=tk.BOTH, expand=True, padx=15)
 
         tk.Label(cards_frame, text="Your Profiles",
-                font=('Segoe UI', 11, 'bold'),
+                font=ui_font(11, 'bold'),
                 bg=COLORS['bg_dark'],
                 fg=COLORS['text_gray']).pack(anchor='w', pady=(0, 10))
 
@@ -465,7 +796,8 @@ class SSHVPNPro:
             lambda e: self.profile_canvas.configure(scrollregion=self.profile_canvas.bbox("all"))
         )
 
-        self.profile_canvas.create_window((0, 0), window=self.profile_cards_container, anchor="nw")
+        self.profile_canvas_window = self.profile_canvas.create_window(
+            (0, 0), window=self.profile_cards_container, anchor="nw")
         self.profile_canvas.configure(yscrollcommand=self.profile_scrollbar.set)
 
         self.profile_canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
@@ -473,18 +805,21 @@ class SSHVPNPro:
 
         # Bind canvas width to update window width
         def _on_canvas_configure(event):
-            self.profile_canvas.itemconfig(self.profile_canvas.find_all()[0], width=event.width)
+            self.profile_canvas.itemconfig(self.profile_canvas_window, width=event.width)
         self.profile_canvas.bind('<Configure>', _on_canvas_configure)
 
         # Mouse wheel for profile cards
-        def _on_profile_mousewheel(event):
-            self.profile_canvas.yview_scroll(int(-1*(event.delta/120)), "units")
-        self.profile_canvas.bind("<MouseWheel>", _on_profile_mousewheel)
-        self.profile_canvas.bind("<Button-4>", lambda e: self.profile_canvas.yview_scroll(-1, "units"))
-        self.profile_canvas.bind("<Button-5>", lambda e: self.profile_canvas.yview_scroll(1, "units"))
+        self.profile_canvas.bindtags(('ScrollCanvas',) + self.profile_canvas.bindtags())
 
         self.update_profile_cards()
 
+    def _create_option_menu(self, parent, var, options, command=None):
+        """Lightweight fixed-choice menu (no popdown toplevel like ttk.Combobox)"""
+        menu_button = tk.OptionMenu(parent, var, *options, command=command)
+        menu_button.configure(font=ui_font(11), **OPTION_MENU_STYLE)
+        menu_button['menu'].configure(font=ui_font(11), **OPTION_MENU_LIST_STYLE)
+        return menu_button
+
     def open_profile_editor(self, profile_name=None):
         """Open pop-up dialog to create/edit profile"""
         self.log(f"Opening editor for: {profile_name if profile_name else 'New Profile'}")
@@ -504,7 +839,7 @@ class SSHVPNPro:
         dialog.geometry(f'500x650+{x}+{y}')
 
         # Main container
-        main_container = tk.Frame(dialog, bg=COLORS['bg_dark'])
+        main_container = tk.Frame(dialog, class_='Themed', bg=COLORS['bg_dark'])
         main_container.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
 
         # Scrollable content
@@ -523,11 +858,7 @@ class SSHVPNPro:
         canvas.bind('<Configure>', _configure_canvas)
 
         # Mouse wheel
-        def _on_mousewheel(event):
-            canvas.yview_scroll(int(-1*(event.delta/120)), "units")
-        canvas.bind("<MouseWheel>", _on_mousewheel)
-        canvas.bind("<Button-4>", lambda e: canvas.yview_scroll(-1, "units"))
-        canvas.bind("<Button-5>", lambda e: canvas.yview_scroll(1, "units"))
+        canvas.bindtags(('ScrollCanvas',) + canvas.bindtags())
 
         canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
@@ -536,11 +867,9 @@ class SSHVPNPro:
         fields = {}
 
         def create_field(label, key, default="", show=None):
-            tk.Label(scrollable_frame, text=label, font=('Segoe UI', 10, 'bold'),
+            tk.Label(scrollable_frame, text=label, font=ui_font(10, 'bold'),
                     bg=COLORS['bg_dark'], fg=COLORS['text_white']).pack(anchor='w', pady=(10, 3))
-            entry = tk.Entry(scrollable_frame, font=('Segoe UI', 11),
-                           bg=COLORS['bg_input'], fg=COLORS['text_white'],
-                           relief='flat', bd=0)
+            entry = tk.Entry(scrollable_frame, font=ui_font(11))
             entry.pack(fill=tk.X, ipady=6)
             entry.insert(0, default)
             if show:
@@ -548,12 +877,9 @@ class SSHVPNPro:
             fields[key] = entry
 
         def create_dropdown(label, key, options, default):
-            tk.Label(scrollable_frame, text=label, font=('Segoe UI', 10, 'bold'),
+            tk.Label(scrollable_frame, text=label, font=ui_font(10, 'bold'),
                     bg=COLORS['bg_dark'], fg=COLORS['text_white']).pack(anchor='w', pady=(10, 3))
             var = tk.StringVar(value=default)
-            dropdown = ttk.Combobox(scrollable_frame, textvariable=var, values=options,
-                                   font=('Segoe UI', 11), state='readonly')
-            dropdown.pack(fill=tk.X, ipady=4)
             fields[key] = var
 
             # Toggle TLS fields for protocol
@@ -567,8 +893,9 @@ class SSHVPNPro:
                     fields['tls_port_container'].pack_forget()
 
             # Only bind protocol dropdown (auth_method handled separately now)
-            if key == 'protocol':
-                dropdown.bind('<<ComboboxSelected>>', on_protocol_change)
+            command = on_protocol_change if key == 'protocol' else None
+            dropdown = self._create_option_menu(scrollable_frame, var, options, command)
+            dropdown.pack(fill=tk.X, ipady=4)
 
             return var
 
@@ -585,11 +912,9 @@ class SSHVPNPro:
 
         # Password field (create before auth dropdown for reference)
         password_container = tk.Frame(scrollable_frame, bg=COLORS['bg_dark'])
-        tk.Label(password_container, text="🔑 Password", font=('Segoe UI', 10, 'bold'),
+        tk.Label(password_container, text="🔑 Password", font=ui_font(10, 'bold'),
                 bg=COLORS['bg_dark'], fg=COLORS['text_white']).pack(anchor='w', pady=(0, 3))
-        password_entry = tk.Entry(password_container, font=('Segoe UI', 11),
-                                 bg=COLORS['bg_input'], fg=COLORS['text_white'],
-                                 relief='flat', bd=0, show='●')
+        password_entry = tk.Entry(password_container, font=ui_font(11), show='●')
         password_entry.pack(fill=tk.X, ipady=6)
         password_entry.insert(0, data.get('password', ''))
         fields['password'] = password_entry
@@ -597,20 +922,17 @@ class SSHVPNPro:
 
         # SSH Key field (create before auth dropdown for reference)
         ssh_key_container = tk.Frame(scrollable_frame, bg=COLORS['bg_dark'])
-        tk.Label(ssh_key_container, text="🔑 SSH Key File", font=('Segoe UI', 10, 'bold'),
+        tk.Label(ssh_key_container, text="🔑 SSH Key File", font=ui_font(10, 'bold'),
                 bg=COLORS['bg_dark'], fg=COLORS['text_white']).pack(anchor='w', pady=(0, 3))
 
         ssh_key_frame = tk.Frame(ssh_key_container, bg=COLORS['bg_dark'])
         ssh_key_frame.pack(fill=tk.X)
 
-        ssh_key_entry = tk.Entry(ssh_key_frame, font=('Segoe UI', 11),
-                                bg=COLORS['bg_input'], fg=COLORS['text_white'],
-                                relief='flat', bd=0)
+        ssh_key_entry = tk.Entry(ssh_key_frame, font=ui_font(11))
         ssh_key_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, ipady=6)
         ssh_key_entry.insert(0, data.get('ssh_key_path', '~/.ssh/id_rsa'))
 
         def browse_key_file():
-            from tkinter import filedialog
             file_path = filedialog.askopenfilename(
                 title="Select SSH Private Key",
                 initialdir=str(Path.home() / '.ssh'),
@@ -621,11 +943,8 @@ class SSHVPNPro:
                 ssh_key_entry.insert(0, file_path)
 
         tk.Button(ssh_key_frame, text="📁",
-                 font=('Segoe UI', 11),
+                 font=ui_font(11),
                  bg=COLORS['bg_lighter'],
-                 fg=COLORS['text_white'],
-                 relief='flat',
-                 cursor='hand2',
                  padx=10,
                  command=browse_key_file).pack(side=tk.LEFT, padx=(5, 0))
 
@@ -634,11 +953,12 @@ class SSHVPNPro:
 
         # Authentication method dropdown (must be AFTER creating containers)
         # Create label and dropdown manually to get reference to the dropdown widget
-        tk.Label(scrollable_frame, text="🔐 Auth Method", font=('Segoe UI', 10, 'bold'),
+        tk.Label(scrollable_frame, text="🔐 Auth Method", font=ui_font(10, 'bold'),
                 bg=COLORS['bg_dark'], fg=COLORS['text_white']).pack(anchor='w', pady=(10, 3))
         auth_var = tk.StringVar(value=data.get('auth_method', 'Password'))
-        auth_dropdown = ttk.Combobox(scrollable_frame, textvariable=auth_var, values=["Password", "SSH Key"],
-                                    font=('Segoe UI', 11), state='readonly')
+        # Handler is defined below, once the containers it toggles are packed
+        auth_dropdown = self._create_option_menu(scrollable_frame, auth_var, ["Password", "SSH Key"],
+                                                 lambda value: on_auth_method_change(value))
         auth_dropdown.pack(fill=tk.X, ipady=4)
         fields['auth_method'] = auth_var
         fields['auth_dropdown'] = auth_dropdown  # Save reference
@@ -665,31 +985,27 @@ class SSHVPNPro:
                 # Pack SSH key field right after auth dropdown, before TLS fields
                 fields['ssh_key_container'].pack(fill=tk.X, pady=(10, 0), after=fields['auth_dropdown'])
 
-        auth_dropdown.bind('<<ComboboxSelected>>', on_auth_method_change)
-
         # TLS fields (hideable)
         sni_container = tk.Frame(scrollable_frame, bg=COLORS['bg_dark'])
-        tk.Label(sni_container, text="🌐 SNI Domain", font=('Segoe UI', 10, 'bold'),
+        tk.Label(sni_container, text="🌐 SNI Domain", font=ui_font(10, 'bold'),
                 bg=COLORS['bg_dark'], fg=COLORS['text_white']).pack(anchor='w', pady=(0, 3))
-        sni_entry = tk.Entry(sni_container, font=('Segoe UI', 11),
-                            bg=COLORS['bg_input'], fg=COLORS['text_white'], relief='flat', bd=0)
+        sni_entry = tk.Entry(sni_container, font=ui_font(11))
         sni_entry.pack(fill=tk.X, ipady=6)
         sni_entry.insert(0, data.get('sni_domain', 'www.google.com'))
         fields['sni'] = sni_entry
         fields['sni_container'] = sni_container
 
         tls_port_container = tk.Frame(scrollable_frame, bg=COLORS['bg_dark'])
-        tk.Label(tls_port_container, text="📍 TLS Port", font=('Segoe UI', 10, 'bold'),
+        tk.Label(tls_port_container, text="📍 TLS Port", font=ui_font(10, 'bold'),
                 bg=COLORS['bg_dark'], fg=COLORS['text_white']).pack(anchor='w', pady=(0, 3))
-        tls_port_entry = tk.Entry(tls_port_container, font=('Segoe UI', 11),
-                                 bg=COLORS['bg_input'], fg=COLORS['text_white'], relief='flat', bd=0)
+        tls_port_entry = tk.Entry(tls_port_container, font=ui_font(11))
         tls_port_entry.pack(fill=tk.X, ipady=6)
         tls_port_entry.insert(0, data.get('tls_port', '443'))
         fields['tls_port'] = tls_port_entry
         fields['tls_port_container'] = tls_port_container
 
         # Advanced section
-        adv_label = tk.Label(scrollable_frame, text="Advanced", font=('Segoe UI', 11, 'bold'),
+        adv_label = tk.Label(scrollable_frame, text="Advanced", font=ui_font(11, 'bold'),
                            bg=COLORS['bg_dark'], fg=COLORS['text_gray'])
         adv_label.pack(anchor='w', pady=(20, 3))
         fields['advanced_label'] = adv_label
@@ -728,20 +1044,18 @@ class SSHVPNPro:
             }
 
             self.save_profiles()
-            self.update_profile_cards()
+            self.schedule_profile_cards()
             self.current_profile = name
             self.profile_label.config(text=f"📁 {name}")
             self.log(f"💾 Saved '{name}'")
             dialog.destroy()
 
-        tk.Button(btn_frame, text="💾 Save Profile", font=('Segoe UI', 12, 'bold'),
-                 bg=COLORS['accent_green'], fg=COLORS['text_white'],
-                 relief='flat', cursor='hand2', padx=25, pady=10,
+        tk.Button(btn_frame, text="💾 Save Profile", font=ui_font(12, 'bold'),
+                 bg=COLORS['accent_green'], padx=25, pady=10,
                  command=save_and_close).pack(side=tk.LEFT, padx=5)
 
-        tk.Button(btn_frame, text="✖ Cancel", font=('Segoe UI', 12),
-                 bg=COLORS['bg_lighter'], fg=COLORS['text_white'],
-                 relief='flat', cursor='hand2', padx=25, pady=10,
+        tk.Button(btn_frame, text="✖ Cancel", font=ui_font(12),
+                 bg=COLORS['bg_lighter'], padx=25, pady=10,
                  command=dialog.destroy).pack(side=tk.LEFT, padx=5)
 
     def create_logs_tab(self):
@@ -753,16 +1067,13 @@ class SSHVPNPro:
         header.pack(fill=tk.X, padx=15, pady=15)
 
         tk.Label(header, text="Activity Logs",
-                font=('Segoe UI', 18, 'bold'),
+                font=ui_font(18, 'bold'),
                 bg=COLORS['bg_dark'],
                 fg=COLORS['text_white']).pack(side=tk.LEFT)
 
         tk.Button(header, text="✖ Clear",
-                 font=('Segoe UI', 11, 'bold'),
+                 font=ui_font(11, 'bold'),
                  bg=COLORS['bg_lighter'],
-                 fg=COLORS['text_white'],
-                 relief='flat',
-                 cursor='hand2',
                  padx=15,
                  pady=5,
                  command=self.clear_logs).pack(side=tk.RIGHT)
@@ -772,30 +1083,32 @@ class SSHVPNPro:
             self.logs_frame,
             bg=COLORS['bg_input'],
             fg=COLORS['text_white'],
-            font=('Consolas', 9),
+            font=ui_font(9, family='Consolas'),
             relief='flat',
-            wrap=tk.WORD
+            wrap=tk.WORD,
+            state='disabled'
         )
         self.log_text.pack(fill=tk.BOTH, expand=True, padx=15, pady=(0, 15))
 
-        self.log("✨ SSH VPN Pro initialized")
+        # Show everything logged before the tab was first opened
+        self._refresh_log_view()
 
     def create_about_tab(self):
         """About tab"""
         self.about_frame = tk.Frame(self.content_area, bg=COLORS['bg_dark'])
 
         tk.Label(self.about_frame, text="SSH VPN Pro",
-                font=('Segoe UI', 24, 'bold'),
+                font=ui_font(24, 'bold'),
                 bg=COLORS['bg_dark'],
                 fg=COLORS['text_white']).pack(pady=(50, 10))
 
         tk.Label(self.about_frame, text="v4.1.0",
-                font=('Segoe UI', 14),
+                font=ui_font(14),
                 bg=COLORS['bg_dark'],
                 fg=COLORS['text_gray']).pack(pady=5)
 
         tk.Label(self.about_frame, text="Secure SSH Tunnel VPN",
-                font=('Segoe UI', 12),
+                font=ui_font(12),
                 bg=COLORS['bg_dark'],
                 fg=COLORS['text_dark']).pack(pady=20)
 
@@ -814,24 +1127,24 @@ Built with Python & Tkinter
         """
 
         tk.Label(self.about_frame, text=info_text,
-                font=('Segoe UI', 10),
+                font=ui_font(10),
                 bg=COLORS['bg_dark'],
                 fg=COLORS['text_gray'],
                 justify=tk.LEFT).pack(pady=20)
 
         # Developer credits
         tk.Label(self.about_frame, text="Developed by",
-                font=('Segoe UI', 10),
+                font=ui_font(10),
                 bg=COLORS['bg_dark'],
                 fg=COLORS['text_dark']).pack()
 
         tk.Label(self.about_frame, text="Mohammad Safarzadeh",
-                font=('Segoe UI', 12, 'bold'),
+                font=ui_font(12, 'bold'),
                 bg=COLORS['bg_dark'],
                 fg=COLORS['accent_green']).pack(pady=5)
 
         github_link = tk.Label(self.about_frame, text="github.com/itsredbull",
-                font=('Segoe UI', 10),
+                font=ui_font(10),
                 bg=COLORS['bg_dark'],
                 fg=COLORS['accent_blue'],
                 cursor='hand2')
@@ -840,9 +1153,17 @@ Built with Python & Tkinter
 
     def switch_tab(self, tab_name):
         """Switch tabs"""
+        if tab_name == self.current_tab:
+            return
+
+        # Build the tab on first visit
+        if tab_name not in self.built_tabs:
+            self.tab_builders[tab_name]()
+            self.built_tabs.add(tab_name)
+
         # Hide all
-        for frame in [self.home_frame, self.config_frame, self.logs_frame, self.about_frame]:
-            frame.pack_forget()
+        for key in self.built_tabs:
+            getattr(self, f'{key}_frame').pack_forget()
 
         # Update buttons
         for key, btn in self.tab_buttons.items():
@@ -852,19 +1173,15 @@ Built with Python & Tkinter
                 btn.config(bg=COLORS['bg_card'], fg=COLORS['text_gray'])
 
         # Show selected
-        if tab_name == 'home':
-            self.home_frame.pack(fill=tk.BOTH, expand=True)
-        elif tab_name == 'config':
-            self.config_frame.pack(fill=tk.BOTH, expand=True)
-        elif tab_name == 'logs':
-            self.logs_frame.pack(fill=tk.BOTH, expand=True)
-        elif tab_name == 'about':
-            self.about_frame.pack(fill=tk.BOTH, expand=True)
+        getattr(self, f'{tab_name}_frame').pack(fill=tk.BOTH, expand=True)
 
         self.current_tab = tab_name
+        self._update_animation_state()
 
     # ===== CONNECTION LOGIC =====
     def toggle_connection(self):
+        if self.connect_button.is_connecting:
+            return  # Connect or disconnect still in progress
         if self.connected:
             self.disconnect()
         else:
@@ -873,6 +1190,10 @@ Built with Python & Tkinter
     def connect(self):
         if self.connected:
             return
+        if self.cleanup_future is not None:
+            # The old teardown would remove tun0 and DNS from under the new tunnel
+            self.log("⏳ Still disconnecting, try again in a moment")
+            return
 
         # Get current profile data
         if not self.current_profile or self.current_profile not in self.profiles:
@@ -881,16 +1202,12 @@ Built with Python & Tkinter
 
         profile = self.profiles[self.current_profile]
 
-        protocol = profile.get('protocol', 'SSH')
-        host = profile.get('host', '').strip()
-        port = profile.get('port', '22').strip()
-        username = profile.get('username', '').strip()
-        auth_method = profile.get('auth_method', 'Password')
-        password = profile.get('password', '').strip()
-        ssh_key_path = profile.get('ssh_key_path', '').strip()
-        udpgw_port = profile.get('udpgw_port', '7300').strip()
-        sni_domain = profile.get('sni_domain', 'www.google.com').strip()
-        tls_port = profile.get('tls_port', '443').strip()
+        cfg = {}
+        for key, default in PROFILE_FIELDS:
+            value = profile.get(key, default)
+            cfg[key] = value.strip() if isinstance(value, str) else value
+        protocol, host, port, username = cfg['protocol'], cfg['host'], cfg['port'], cfg['username']
+        auth_method, tls_port, sni_domain = cfg['auth_method'], cfg['tls_port'], cfg['sni_domain']
 
         # Validate required fields
         if not all([host, port, username]):
@@ -898,10 +1215,10 @@ Built with Python & Tkinter
             return
 
         # Validate authentication
-        if auth_method == "Password" and not password:
+        if auth_method == "Password" and not cfg['password']:
             messagebox.showerror("Error", "Password is required")
             return
-        elif auth_method == "SSH Key" and not ssh_key_path:
+        elif auth_method == "SSH Key" and not cfg['ssh_key_path']:
             messagebox.showerror("Error", "SSH key path is required")
             return
 
@@ -909,8 +1226,8 @@ Built with Python & Tkinter
             messagebox.showerror("Error", "Please fill SNI Domain and TLS Port for SSH-TLS")
             return
 
-        self.status_label.config(text="Connecting...", fg=COLORS['accent_orange'])
-        self.status_subtitle.config(text="Please wait...")
+        self._set_label(self.status_label, "Connecting...", COLORS['accent_orange'])
+        self._set_label(self.status_subtitle, "Please wait...")
         self.connect_button.set_connecting()
         self.update_tray_icon('connecting')
 
@@ -919,13 +1236,20 @@ Built with Python & Tkinter
         else:
             self.log(f"🔄 Connecting to {host}:{port}...")
 
-        dns = profile.get('dns_servers', '8.8.8.8, 8.8.4.4').strip()
-
-        threading.Thread(target=self._connect_thread,
-                        args=(protocol, host, port, username, auth_method, password, ssh_key_path, udpgw_port, sni_domain, tls_port, dns),
-                        daemon=True).start()
-
-    def _connect_thread(self, protocol, host, port, username, auth_method, password, ssh_key_path, udpgw_port, sni_domain, tls_port, dns):
+        self.executor.submit(self._connect_thread, cfg)
+
+    def _connect_thread(self, cfg):
+        protocol = cfg['protocol']
+        host = cfg['host']
+        port = cfg['port']
+        username = cfg['username']
+        auth_method = cfg['auth_method']
+        password = cfg['password']
+        ssh_key_path = cfg['ssh_key_path']
+        udpgw_port = cfg['udpgw_port']
+        sni_domain = cfg['sni_domain']
+        tls_port = cfg['tls_port']
+        dns = cfg['dns_servers']
         try:
             if not VPN_CORE_AVAILABLE:
                 self.log("⚠️ Simulation mode (vpn_core not found)")
@@ -936,8 +1260,11 @@ Built with Python & Tkinter
             # SSH-TLS: Start stunnel first
             if protocol == "SSH-TLS":
                 self.log("🔐 Starting stunnel (SSH-over-TLS)...")
-                config_path, _ = create_stunnel_config(host, int(tls_port), sni_domain)
-                result = start_stunnel(config_path, self.log)
+                # Only our own previous stunnel, if one survived, is stopped;
+                # nothing else on the machine is touched
+                self._stop_stunnel()
+                config_path, stunnel_port = create_stunnel_config(host, int(tls_port), sni_domain)
+                result = start_stunnel(config_path, self.log, stunnel_port)
 
                 if not result or result[0] is None:
                     self.log("❌ stunnel failed to start")
@@ -947,21 +1274,14 @@ Built with Python & Tkinter
                 self.stunnel_process, local_ssh_port = result
                 self.log(f"✅ stunnel running, local port {local_ssh_port} → {host}:{tls_port}")
 
-                # Wait for stunnel to fully establish TLS connection
-                self.log("⏳ Waiting for TLS handshake...")
-                time.sleep(5)
-
-                # Test SSH connection through stunnel
+                # Test SSH connection through stunnel, retrying until the TLS
+                # leg is up instead of sleeping a fixed 5 s first
                 self.log(f"🔍 Testing SSH through stunnel to {host}...")
-                if not test_ssh_connection('127.0.0.1', local_ssh_port, username, auth_method, password, ssh_key_path, self.log):
+                if not test_ssh_connection('127.0.0.1', local_ssh_port, username, auth_method, password, ssh_key_path,
+                                           self.log, retry_for=STUNNEL_READY_TIMEOUT):
                     self.log("❌ SSH through stunnel failed")
                     self.log(f"💡 Check: Server stunnel on {host}:{tls_port}, correct port, SSH forwarding")
-                    if self.stunnel_process:
-                        try:
-                            import os
-                            os.kill(self.stunnel_process.pid, 9)
-                        except:
-                            pass
+                    self._stop_stunnel()
                     self.root.after(0, self._connection_failed)
                     return
 
@@ -991,19 +1311,14 @@ Built with Python & Tkinter
                 self.root.after(0, self._connection_success, host)
             else:
                 self.log("❌ Tunnel failed")
-                # Kill stunnel if it was started
-                if protocol == "SSH-TLS" and self.stunnel_process:
-                    self.stunnel_process.kill()
+                # Stop stunnel if it was started
+                self._stop_stunnel()
                 self.root.after(0, self._connection_failed)
 
         except Exception as e:
             self.log(f"❌ Error: {e}")
-            # Kill stunnel if it was started
-            if protocol == "SSH-TLS" and self.stunnel_process:
-                try:
-                    self.stunnel_process.kill()
-                except:
-                    pass
+            # Stop stunnel if it was started
+            self._stop_stunnel()
             self.root.after(0, self._connection_failed)
 
     def _connection_success(self, host):
@@ -1011,73 +1326,101 @@ Built with Python & Tkinter
         self.connection_start_time = time.time()
 
         # Capture initial network stats
+        self.open_network_stats()
         self.initial_rx_bytes, self.initial_tx_bytes = self.get_network_stats()
 
-        self.status_label.config(text="Connected", fg=COLORS['accent_green'])
-        self.status_subtitle.config(text="Secure tunnel active")
+        self._set_label(self.status_label, "Connected", COLORS['accent_green'])
+        self._set_label(self.status_subtitle, "Secure tunnel active")
         self.connect_button.set_connected()
         self.update_tray_icon('connected')
 
-        self.server_value.config(text=host[:20])
+        self.set_stat('server', host[:20])
 
         # Update UDP status from current profile
         if self.current_profile and self.current_profile in self.profiles:
             profile = self.profiles[self.current_profile]
             udpgw_port = profile.get('udpgw_port', '7300')
-            self.udp_value.config(text=f"Active:{udpgw_port}", fg=COLORS['accent_green'])
+            self.set_stat('udp', f"Active:{udpgw_port}", COLORS['accent_green'])
         else:
-            self.udp_value.config(text="Active", fg=COLORS['accent_green'])
+            self.set_stat('udp', "Active", COLORS['accent_green'])
 
         self.log(f"✅ Connected to {host}")
         self.start_uptime_timer()
 
-        try:
-            subprocess.run(['notify-send', 'SSH VPN Pro', f'Connected to {host}'],
-                          check=False, timeout=2)
-        except:
-            pass
+        # On the worker pool so a stalled notification daemon can't freeze the UI;
+        # a missing notify-send just fails the future
+        self.executor.submit(subprocess.run, ['notify-send', 'SSH VPN Pro', f'Connected to {host}'],
+                             check=False, timeout=2, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
     def _connection_failed(self):
         self.log("❌ Connection failed. Check logs for details.")
         # No need for manual cleanup here, vpn_core's create_tun_vpn handles it
-        self.status_label.config(text="Failed", fg=COLORS['accent_red'])
-        self.status_subtitle.config(text="Check credentials/logs")
+        self._set_label(self.status_label, "Failed", COLORS['accent_red'])
+        self._set_label(self.status_subtitle, "Check credentials/logs")
         self.connect_button.set_disconnected()
         self.update_tray_icon('disconnected')
 
     def disconnect(self):
+        """Tear down the tunnel; returns the future of the background cleanup"""
         self.log("🔄 Disconnecting...")
         self.stop_uptime_timer()
+        self.close_network_stats()
 
-        if VPN_CORE_AVAILABLE:
-            # Centralized cleanup
-            cleanup_network(self.vpn_info, self.log)
-        
-        # Kill stunnel if it was running
-        if self.stunnel_process:
-            try:
-                self.stunnel_process.terminate()
-                self.stunnel_process.wait(timeout=2)
-            except:
-                try: self.stunnel_process.kill() 
-                except: pass
-            self.stunnel_process = None
+        cleanup = self.executor.submit(self._disconnect_cleanup, self.vpn_info, self.stunnel_process)
+        self.cleanup_future = cleanup
+        self.stunnel_process = None
 
         self.connected = False
         self.connection_start_time = None
         self.vpn_info = None
 
-        self.status_label.config(text="Not Connected", fg=COLORS['text_gray'])
-        self.status_subtitle.config(text="Tap to connect")
+        # Busy until the cleanup is done, so no new connect can race it
+        self._set_label(self.status_label, "Disconnecting...", COLORS['accent_orange'])
+        self._set_label(self.status_subtitle, "Please wait...")
+        self.connect_button.set_connecting()
+        self.update_tray_icon('connecting')
+
+        self.set_stat('time', "00:00:00")
+        self.set_stat('data', "0 MB")
+        self.set_stat('server', "None")
+        self.set_stat('udp', "Inactive", COLORS['text_white'])
+
+        cleanup.add_done_callback(lambda f: self.root.after(0, self._disconnect_done))
+        return cleanup
+
+    def _disconnect_done(self):
+        self.cleanup_future = None
+        self._set_label(self.status_label, "Not Connected", COLORS['text_gray'])
+        self._set_label(self.status_subtitle, "Tap to connect")
         self.connect_button.set_disconnected()
         self.update_tray_icon('disconnected')
+        self.log("✅ Disconnected")
+
+    def _disconnect_cleanup(self, vpn_info, stunnel_process):
+        if VPN_CORE_AVAILABLE:
+            # Centralized cleanup
+            cleanup_network(vpn_info, self.log)
 
-        self.time_value.config(text="00:00:00")
-        self.data_value.config(text="0 MB")
-        self.server_value.config(text="None")
-        self.udp_value.config(text="Inactive", fg=COLORS['text_white'])
+        # Stop stunnel if it was running
+        if stunnel_process:
+            self._kill_process(stunnel_process)
 
-        self.log("✅ Disconnected")
+    def _stop_stunnel(self):
+        if self.stunnel_process:
+            self._kill_process(self.stunnel_process)
+            self.stunnel_process = None
+
+    def _kill_process(self, proc, timeout=3):
+        """Ask a child to exit so it can release its port, SIGKILL only if it hangs"""
+        try:
+            proc.terminate()
+            try:
+                proc.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+        except OSError:
+            pass  # Already gone
 
     def ping_server(self):
         # Get current profile
@@ -1085,15 +1428,32 @@ Built with Python & Tkinter
             messagebox.showerror("Error", "Please select a profile from Config tab")
             return
 
-        host = self.profiles[self.current_profile].get('host', '').strip()
+        profile = self.profiles[self.current_profile]
+        host = profile.get('host', '').strip()
+        # Time the port we actually connect to; that is what the user cares about
+        if profile.get('protocol', 'SSH') == 'SSH-TLS':
+            port = profile.get('tls_port', '443').strip()
+        else:
+            port = profile.get('port', '22').strip()
 
         if not host:
             messagebox.showerror("Error", "No server configured in selected profile")
             return
 
-        self.log(f"📡 Pinging {host}...")
+        self.log(f"📡 Pinging {host}:{port}...")
 
         def do_ping():
+            try:
+                rtts = tcp_latency(host, int(port))
+            except (OSError, ValueError) as e:
+                self.log(f"TCP probe failed ({e}), trying ICMP ping")
+            else:
+                avg_ms = sum(rtts) / len(rtts)
+                self.log(f"✅ Ping: {avg_ms:.1f} ms (TCP {port})")
+                self.root.after(0, lambda: messagebox.showinfo("Ping Result", f"{host}:{port}\n\nLatency: {avg_ms:.1f} ms"))
+                return
+
+            # Port unreachable: ICMP still tells whether the host itself is up
             try:
                 result = subprocess.run(
                     ['ping', '-c', '3', '-W', '2', host],
@@ -1103,8 +1463,7 @@ Built with Python & Tkinter
                 )
 
                 # Parse ping output for average time
-                import re
-                match = re.search(r'rtt min/avg/max/mdev = ([\d.]+)/([\d.]+)/([\d.]+)/([\d.]+)', result.stdout)
+                match = PING_RTT_RE.search(result.stdout)
                 if match:
                     avg_ms = float(match.group(2))
                     self.log(f"✅ Ping: {avg_ms:.1f} ms")
@@ -1128,24 +1487,38 @@ Built with Python & Tkinter
     # ===== PROFILE MANAGEMENT =====
     def load_profiles(self):
         try:
-            if self.profiles_file.exists():
-                with open(self.profiles_file, 'r') as f:
-                    self.profiles = json.load(f)
+            data = self.profiles_file.read_bytes()
+        except OSError:
+            return  # No saved profiles yet
+        try:
+            self.profiles = orjson.loads(data) if orjson else json.loads(data)
         except:
             self.profiles = {}
 
     def save_profiles(self):
+        """Mark profiles as changed; they are written once pending events are handled"""
+        if not self.profiles_dirty:
+            self.profiles_dirty = True
+            self.root.after_idle(self.flush_profiles)
+
+    def flush_profiles(self):
+        """Write profiles to disk if they changed since the last write"""
+        if not self.profiles_dirty:
+            return
+        self.profiles_dirty = False
         try:
-            # Create file with secure permissions (owner read/write only)
-            import os
-
-            # Save profiles
-            with open(self.profiles_file, 'w') as f:
-                json.dump(self.profiles, f, indent=2)
-
-            # Set file permissions to 600 (owner read/write only)
-            # This prevents other users from reading your passwords
-            os.chmod(self.profiles_file, 0o600)
+            # Write a temp file created as 600 (owner read/write only, so other
+            # users can't read your passwords), then atomically swap it in.
+            # Indented, so the file stays easy to edit by hand
+            tmp_file = self.profiles_file.with_suffix('.tmp')
+            if orjson:
+                data = orjson.dumps(self.profiles, option=orjson.OPT_INDENT_2)
+            else:
+                data = json.dumps(self.profiles, indent=2).encode()
+            fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_file, self.profiles_file)
 
             self.log("💾 Saved")
         except Exception as e:
@@ -1153,45 +1526,99 @@ Built with Python & Tkinter
 
     def update_config_list(self):
         """Update profile cards in the new UI"""
+        self.schedule_profile_cards()
+
+    def schedule_profile_cards(self):
+        """Rebuild the profile cards once, after the current burst of events"""
+        if self.cards_rebuild_pending:
+            return
+        self.cards_rebuild_pending = True
+        self.root.after_idle(self._rebuild_profile_cards)
+
+    def _rebuild_profile_cards(self):
+        self.cards_rebuild_pending = False
         self.update_profile_cards()
 
     def update_profile_cards(self):
         """Create visual cards for each saved profile"""
-        # Clear existing cards
-        for widget in self.profile_cards_container.winfo_children():
-            widget.destroy()
+        if not hasattr(self, 'profile_cards_container'):
+            return  # Profiles tab not built yet; it renders the cards when opened
+
+        # Drop cards for deleted profiles
+        for name in [n for n in self.profile_cards if n not in self.profiles]:
+            self.profile_cards.pop(name)['card'].destroy()
 
         if not self.profiles:
             # Show empty state
-            tk.Label(self.profile_cards_container,
-                    text="No profiles yet. Tap '+ New' to create one!",
-                    font=('Segoe UI', 10),
-                    bg=COLORS['bg_dark'],
-                    fg=COLORS['text_gray']).pack(pady=30)
+            if not self.profiles_empty_label:
+                self.profiles_empty_label = tk.Label(self.profile_cards_container,
+                        text="No profiles yet. Tap '+ New' to create one!",
+                        font=ui_font(10),
+                        bg=COLORS['bg_dark'],
+                        fg=COLORS['text_gray'])
+                self.profiles_empty_label.pack(pady=30)
             return
 
-        # Create card for each profile
+        if self.profiles_empty_label:
+            self.profiles_empty_label.destroy()
+            self.profiles_empty_label = None
+
+        # Reuse cards whose displayed fields are unchanged; selection is just a recolour
         for name, data in self.profiles.items():
-            self.create_profile_card(name, data)
+            signature = self._card_signature(data)
+            existing = self.profile_cards.get(name)
+            if existing and existing['signature'] == signature:
+                self._apply_card_selection(existing, self.current_profile == name)
+                continue
+
+            # Build the replacement in the old card's slot to keep the list order
+            self.profile_cards[name] = self.create_profile_card(
+                name, data, before=existing['card'] if existing else None)
+            if existing:
+                existing['card'].destroy()
+
+    def _card_signature(self, data):
+        """The profile fields a card displays; a change means the card is rebuilt"""
+        return (data.get('username', ''), data.get('host', ''),
+                data.get('port', '22'), data.get('protocol', 'SSH'))
+
+    def _apply_card_selection(self, widgets, selected):
+        """Flip an existing card between its selected and normal colours"""
+        if widgets['selected'] == selected:
+            return
+        widgets['selected'] = selected
+        bg = COLORS['accent_blue'] if selected else COLORS['bg_card']
+        widgets['card'].config(bg=bg, highlightthickness=2 if selected else 0, highlightbackground=bg)
+        for key in ('content', 'name_label', 'info_label'):
+            widgets[key].config(bg=bg)
+        widgets['badge'].config(bg=COLORS['accent_green'] if selected else widgets['badge_color'])
+
+    def create_profile_card(self, name, data, before=None):
+        """Create a single profile card; returns its widgets for later updates"""
+        selected = self.current_profile == name
+        card_bg = COLORS['bg_card']
+        white = COLORS['text_white']
+        # Selected cards are created highlighted rather than recoloured afterwards
+        content_bg = COLORS['accent_blue'] if selected else card_bg
 
-    def create_profile_card(self, name, data):
-        """Create a single profile card"""
         card = tk.Frame(self.profile_cards_container,
-                       bg=COLORS['bg_card'],
+                       bg=content_bg,
                        relief='flat',
                        bd=0)
-        card.pack(fill=tk.X, pady=5, padx=5)
+        if selected:
+            card.config(highlightthickness=2, highlightbackground=content_bg)
+        card.pack(fill=tk.X, pady=5, padx=5, before=before)
 
         # Main content area (clickable)
-        content = tk.Frame(card, bg=COLORS['bg_card'], cursor='hand2')
+        content = tk.Frame(card, bg=content_bg, cursor='hand2')
         content.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=10, pady=10)
 
         # Profile name
         name_label = tk.Label(content,
                              text=name,
-                             font=('Segoe UI', 12, 'bold'),
-                             bg=COLORS['bg_card'],
-                             fg=COLORS['text_white'],
+                             font=ui_font(12, 'bold'),
+                             bg=content_bg,
+                             fg=white,
                              cursor='hand2')
         name_label.pack(anchor='w')
 
@@ -1199,8 +1626,8 @@ Built with Python & Tkinter
         host_info = f"{data.get('username', '')}@{data.get('host', '')}:{data.get('port', '22')}"
         info_label = tk.Label(content,
                              text=host_info,
-                             font=('Segoe UI', 9),
-                             bg=COLORS['bg_card'],
+                             font=ui_font(9),
+                             bg=content_bg,
                              fg=COLORS['text_gray'],
                              cursor='hand2')
         info_label.pack(anchor='w')
@@ -1210,9 +1637,9 @@ Built with Python & Tkinter
         badge_color = COLORS['accent_blue'] if protocol == 'SSH' else COLORS['accent_orange']
         badge = tk.Label(content,
                         text=f" {protocol} ",
-                        font=('Segoe UI', 8, 'bold'),
-                        bg=badge_color,
-                        fg=COLORS['text_white'],
+                        font=ui_font(8, 'bold'),
+                        bg=COLORS['accent_green'] if selected else badge_color,
+                        fg=white,
                         cursor='hand2')
         badge.pack(anchor='w', pady=(3, 0))
 
@@ -1220,7 +1647,7 @@ Built with Python & Tkinter
         def select_this_profile(e=None):
             self.current_profile = name
             self.profile_label.config(text=f"📁 {name}")
-            self.update_profile_cards()  # Refresh to show selection
+            self.schedule_profile_cards()  # Refresh to show selection
             self.log(f"✅ Selected '{name}'")
 
         name_label.bind('<Button-1>', select_this_profile)
@@ -1228,26 +1655,15 @@ Built with Python & Tkinter
         badge.bind('<Button-1>', select_this_profile)
         content.bind('<Button-1>', select_this_profile)
 
-        # Highlight if selected
-        if self.current_profile == name:
-            card.config(bg=COLORS['accent_blue'], highlightthickness=2, highlightbackground=COLORS['accent_blue'])
-            content.config(bg=COLORS['accent_blue'])
-            name_label.config(bg=COLORS['accent_blue'])
-            info_label.config(bg=COLORS['accent_blue'])
-            badge.config(bg=COLORS['accent_green'])
-
         # Buttons on the right
-        btn_frame = tk.Frame(card, bg=COLORS['bg_card'])
+        btn_frame = tk.Frame(card, bg=card_bg)
         btn_frame.pack(side=tk.RIGHT, padx=5)
 
         # Edit button
         edit_btn = tk.Button(btn_frame,
                             text="✎",
-                            font=('Segoe UI', 14, 'bold'),
+                            font=ui_font(14, 'bold'),
                             bg=COLORS['bg_lighter'],
-                            fg=COLORS['text_white'],
-                            relief='flat',
-                            cursor='hand2',
                             padx=10,
                             pady=4,
                             command=lambda: self.load_profile_to_editor(name))
@@ -1256,16 +1672,25 @@ Built with Python & Tkinter
         # Delete button
         delete_btn = tk.Button(btn_frame,
                               text="✖",
-                              font=('Segoe UI', 14, 'bold'),
+                              font=ui_font(14, 'bold'),
                               bg=COLORS['bg_lighter'],
                               fg=COLORS['accent_red'],
-                              relief='flat',
-                              cursor='hand2',
                               padx=10,
                               pady=4,
                               command=lambda: self.delete_profile_card(name))
         delete_btn.pack(pady=2)
 
+        return {
+            'card': card,
+            'content': content,
+            'name_label': name_label,
+            'info_label': info_label,
+            'badge': badge,
+            'badge_color': badge_color,
+            'selected': selected,
+            'signature': self._card_signature(data),
+        }
+
     def load_profile_to_editor(self, name):
         """Load a profile into the editor pop-up for editing"""
         if self.connected:
@@ -1283,7 +1708,7 @@ Built with Python & Tkinter
             if name in self.profiles:
                 del self.profiles[name]
                 self.save_profiles()
-                self.update_profile_cards()
+                self.schedule_profile_cards()
 
                 # Clear current profile if deleted
                 if self.current_profile == name:
@@ -1302,8 +1727,33 @@ Built with Python & Tkinter
 
 
     # ===== TIMER =====
+    def open_network_stats(self):
+        """Keep the tun0 counters open so each tick is a single pread per file"""
+        self.close_network_stats()
+        try:
+            self.stats_fds = tuple(os.open(f'/sys/class/net/tun0/statistics/{name}', os.O_RDONLY)
+                                   for name in ('rx_bytes', 'tx_bytes'))
+        except OSError:
+            self.stats_fds = None
+
+    def close_network_stats(self):
+        if self.stats_fds:
+            for fd in self.stats_fds:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self.stats_fds = None
+
     def get_network_stats(self):
         """Get tun0 interface statistics"""
+        if self.stats_fds:
+            try:
+                rx_fd, tx_fd = self.stats_fds
+                return int(os.pread(rx_fd, 32, 0)), int(os.pread(tx_fd, 32, 0))
+            except (OSError, ValueError):
+                # Interface went away; drop the handles and retry by path
+                self.close_network_stats()
         try:
             with open('/sys/class/net/tun0/statistics/rx_bytes', 'r') as f:
                 rx_bytes = int(f.read().strip())
@@ -1314,72 +1764,139 @@ Built with Python & Tkinter
             return 0, 0
 
     def start_uptime_timer(self):
+        """Start the 1 s clock and the slower bandwidth/UDP sampler"""
+        self.udp_ok_streak = 0
+        self.udp_probe_countdown = 0
+        self._tick_clock()
+        self._sample_net()
+
+    def _tick_clock(self):
         if self.connected and self.connection_start_time:
             elapsed = int(time.time() - self.connection_start_time)
             h = elapsed // 3600
             m = (elapsed % 3600) // 60
             s = elapsed % 60
-            self.time_value.config(text=f"{h:02d}:{m:02d}:{s:02d}")
-
-            # Update data usage
-            rx_bytes, tx_bytes = self.get_network_stats()
-            total_bytes = (rx_bytes - self.initial_rx_bytes) + (tx_bytes - self.initial_tx_bytes)
-
-            if total_bytes < 1024:
-                data_str = f"{total_bytes} B"
-            elif total_bytes < 1024 * 1024:
-                data_str = f"{total_bytes / 1024:.1f} KB"
-            elif total_bytes < 1024 * 1024 * 1024:
-                data_str = f"{total_bytes / (1024 * 1024):.1f} MB"
-            else:
-                data_str = f"{total_bytes / (1024 * 1024 * 1024):.2f} GB"
+            self.set_stat('time', f"{h:02d}:{m:02d}:{s:02d}")
+            self.uptime_timer = self.root.after(1000, self._tick_clock)
 
-            self.data_value.config(text=data_str)
+    def _sample_net(self):
+        if not (self.connected and self.connection_start_time):
+            return
 
-            # Check UDP gateway status every 5 seconds
-            if VPN_CORE_AVAILABLE and elapsed % 5 == 0 and self.current_profile:
-                profile = self.profiles.get(self.current_profile, {})
-                udpgw_port = int(profile.get('udpgw_port', '7300'))
-                if check_udpgw_status(udpgw_port):
-                    self.udp_value.config(text=f"Active:{udpgw_port}", fg=COLORS['accent_green'])
-                else:
-                    self.udp_value.config(text="Failed", fg=COLORS['accent_red'])
+        # sysfs counters are a pread on already-open files, cheap enough for the Tk thread
+        rx_bytes, tx_bytes = self.get_network_stats()
+        total_bytes = (rx_bytes - self.initial_rx_bytes) + (tx_bytes - self.initial_tx_bytes)
+
+        if total_bytes < 1024:
+            data_str = f"{total_bytes} B"
+        elif total_bytes < 1024 * 1024:
+            data_str = f"{total_bytes / 1024:.1f} KB"
+        elif total_bytes < 1024 * 1024 * 1024:
+            data_str = f"{total_bytes / (1024 * 1024):.1f} MB"
+        else:
+            data_str = f"{total_bytes / (1024 * 1024 * 1024):.2f} GB"
+
+        self.set_stat('data', data_str)
 
-            self.uptime_timer = self.root.after(1000, self.start_uptime_timer)
+        # The UDP gateway probe reads /proc/net/tcp (a loopback connect without
+        # procfs), cheap enough for the Tk thread as well
+        self.udp_probe_countdown -= 1
+        if VPN_CORE_AVAILABLE and self.current_profile and self.udp_probe_countdown <= 0:
+            self.udp_probe_countdown = 1  # Until the result says otherwise
+            profile = self.profiles.get(self.current_profile, {})
+            udpgw_port = int(profile.get('udpgw_port', '7300'))
+            self._show_udpgw_status(udpgw_port, check_udpgw_status(udpgw_port))
+
+        self.net_timer = self.root.after(STATS_INTERVAL_MS, self._sample_net)
+
+    def _show_udpgw_status(self, udpgw_port, active):
+        if not self.connected:
+            return
+        # Once the gateway has been up for a few probes in a row, check less often
+        self.udp_ok_streak = self.udp_ok_streak + 1 if active else 0
+        if self.udp_ok_streak >= UDPGW_STABLE_PROBES:
+            self.udp_probe_countdown = UDPGW_STABLE_EVERY
+        if active:
+            self.set_stat('udp', f"Active:{udpgw_port}", COLORS['accent_green'])
+        else:
+            self.set_stat('udp', "Failed", COLORS['accent_red'])
 
     def stop_uptime_timer(self):
         if self.uptime_timer:
             self.root.after_cancel(self.uptime_timer)
             self.uptime_timer = None
+        if self.net_timer:
+            self.root.after_cancel(self.net_timer)
+            self.net_timer = None
 
     # ===== LOGGING =====
     def log(self, message):
+        """Record a log line; safe to call from worker threads"""
         timestamp = datetime.now().strftime("%H:%M:%S")
-        log_message = f"[{timestamp}] {message}\n"
-        if hasattr(self, 'log_text'):
-            self.log_text.insert(tk.END, log_message)
-            self.log_text.see(tk.END)
-        else:
-            print(log_message.strip())
+        line = f"[{timestamp}] {message}\n"
+        with self.log_lock:
+            self.log_lines.append(line)
+            # Logs tab not built yet: it renders log_lines when first opened
+            if not hasattr(self, 'log_text'):
+                return
+            self.log_pending.append(line)
+            if self.log_flush_pending:
+                return
+            self.log_flush_pending = True
+        self.root.after_idle(self._flush_logs)
+
+    def _flush_logs(self):
+        """Append everything logged since the last flush in one insert"""
+        with self.log_lock:
+            pending, self.log_pending = self.log_pending, []
+            self.log_flush_pending = False
+        if not pending:
+            return
 
-    def clear_logs(self):
+        self.log_text.configure(state='normal')
+        self.log_text.insert(tk.END, ''.join(pending))
+        # Trim from the top so the widget never holds more than the ring
+        excess = int(self.log_text.index('end-1c').split('.')[0]) - 1 - LOG_MAX_LINES
+        if excess > 0:
+            self.log_text.delete('1.0', f'{excess + 1}.0')
+        self.log_text.configure(state='disabled')
+        self.log_text.see(tk.END)
+
+    def _refresh_log_view(self):
+        """Render the whole ring buffer into the log widget"""
+        with self.log_lock:
+            text = ''.join(self.log_lines)
+            self.log_pending = []
+        self.log_text.configure(state='normal')
         self.log_text.delete(1.0, tk.END)
+        self.log_text.insert(tk.END, text)
+        self.log_text.configure(state='disabled')
+        self.log_text.see(tk.END)
+
+    def clear_logs(self):
+        with self.log_lock:
+            self.log_lines.clear()
+        self._refresh_log_view()
         self.log("🗑️ Cleared")
 
     # ===== SYSTEM TRAY =====
     def setup_tray_icon(self):
         """Setup system tray icon"""
-        if not TRAY_AVAILABLE:
+        if not self.tray_enabled:
+            return
+
+        # A missing or broken backend only disables the tray
+        try:
+            import pystray
+            import PIL.ImageDraw
+        except Exception as e:
+            self.tray_enabled = False
+            self.log(f"⚠️ System tray unavailable: {e}")
             return
 
-        def create_icon_image(color=(79, 124, 255)):
-            """Create VPN shield icon"""
-            img = Image.new('RGB', (64, 64), color=(0, 0, 0))
-            draw = ImageDraw.Draw(img)
-            # Draw shield
-            draw.polygon([(32, 10), (50, 18), (50, 40), (32, 54), (14, 40), (14, 18)],
-                        fill=color, outline=(255, 255, 255))
-            return img
+        # Rasterize every status once; later updates just swap the image
+        self.tray_images = {status: create_tray_icon_image(color)
+                            for status, color in TRAY_COLORS.items()}
 
         def on_tray_click(icon, item):
             """Show/hide window"""
@@ -1403,7 +1920,7 @@ Built with Python & Tkinter
         # Create and run tray icon in background thread
         self.tray_icon = pystray.Icon(
             "ssh_vpn_pro",
-            create_icon_image(),
+            self.tray_images[self.tray_status],
             "SSH VPN Pro",
             menu
         )
@@ -1419,23 +1936,10 @@ Built with Python & Tkinter
 
     def update_tray_icon(self, status='disconnected'):
         """Update tray icon color based on connection status"""
-        if not TRAY_AVAILABLE or not self.tray_icon:
-            return
-
-        colors = {
-            'disconnected': (79, 124, 255),    # Blue
-            'connecting': (255, 159, 67),      # Orange
-            'connected': (0, 224, 150)          # Green
-        }
-
-        def create_icon_image(color):
-            img = Image.new('RGB', (64, 64), color=(0, 0, 0))
-            draw = ImageDraw.Draw(img)
-            draw.polygon([(32, 10), (50, 18), (50, 40), (32, 54), (14, 40), (14, 18)],
-                        fill=color, outline=(255, 255, 255))
-            return img
-
-        self.tray_icon.icon = create_icon_image(colors.get(status, colors['disconnected']))
+        self.tray_status = status if status in TRAY_COLORS else 'disconnected'
+        if not self.tray_icon:
+            return  # Tray not set up yet; it starts with the current status
+        self.tray_icon.icon = self.tray_images[self.tray_status]
 
     def open_github(self):
         """Open GitHub profile in browser"""
@@ -1455,18 +1959,28 @@ Built with Python & Tkinter
         self.root.mainloop()
 
     def on_closing(self):
+        self.flush_profiles()
         if self.connected:
             if messagebox.askyesno("Exit", "VPN is connected. Disconnect and exit?"):
-                self.disconnect()
+                cleanup = self.disconnect()
                 if self.tray_icon:
                     self.tray_icon.stop()
                 self.instance_lock.release()
-                self.root.after(2000, self.root.destroy)
+                # Close once the network is actually restored
+                cleanup.add_done_callback(lambda f: self.root.after(0, self._shutdown))
         else:
             if self.tray_icon:
                 self.tray_icon.stop()
             self.instance_lock.release()
-            self.root.destroy()
+            if self.cleanup_future is not None:
+                # Still disconnecting: close once the network is restored
+                self.cleanup_future.add_done_callback(lambda f: self.root.after(0, self._shutdown))
+            else:
+                self._shutdown()
+
+    def _shutdown(self):
+        self.executor.shutdown(wait=False)
+        self.root.destroy()
 
 
 if __name__ == "__main__":
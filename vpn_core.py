@@ -11,334 +11,868 @@ import time
 import os
 import signal
 import atexit
+import functools
+import hashlib
+import ipaddress
+import select
+import shutil
 import socket
+import struct
+import threading
+
+import ssh_socks_simple
+
+try:
+    from pyroute2 import IPRoute  # Optional: route lookups over netlink, no `ip` fork
+except ImportError:
+    IPRoute = None
 
 RESOLV_BACKUP = '/tmp/resolv.conf.ssh_vpn_pro.bak' # Use /tmp for better compatibility
+# Every helper process we spawn, matched by a single pkill during cleanup
+VPN_PROCESS_PATTERN = r'badvpn-tun2socks|badvpn-udpgw|ssh_socks_simple\.py'
+
+# Seconds to wait for stunnel to bind its local listener
+STUNNEL_START_TIMEOUT = 7
+
+# Seconds to wait for tun2socks to attach to tun0 and udpgw to listen
+HELPERS_READY_TIMEOUT = 5
+
+# Local SOCKS port tun2socks forwards into
+SOCKS_PORT = 1080
+
+# Clients that passed test_ssh_connection, keyed by _pool_key(), so
+# create_tun_vpn and repeated tests reuse the handshake instead of logging in
+# again: key -> (monotonic time pooled, client)
+_SSH_POOL = {}
+_SSH_POOL_LOCK = threading.Lock()
+# Seconds an unused pooled client stays logged in; it only has to bridge a
+# test and the connect that follows it
+SSH_POOL_TTL = 30
+_POOL_TIMER = None  # Pending _pool_expire run, if any (guarded by _SSH_POOL_LOCK)
+
+# Resolved server addresses: host -> (monotonic time, address), kept DNS_CACHE_TTL seconds
+_DNS_CACHE = {}
+DNS_CACHE_TTL = 60
+
+# Pooled transports carry the SOCKS traffic, so negotiate the fast ciphers for them
+ssh_socks_simple.prefer_fast_ciphers()
+
+# Small stacks for the in-process relay workers. stack_size() is process-wide,
+# so this happens at import, before the app starts any thread; every thread
+# started later (paramiko's, the GUI's workers, the tray) gets it as well,
+# and all of them are shallow
+threading.stack_size(ssh_socks_simple.WORKER_STACK_SIZE)
+
+# Setup/cleanup script text, built once at import; call sites only fill
+# in the per-connection values with str.format
+SETUP_SCRIPT_HEAD = (
+    "#!/bin/bash\nset -e\n\n"
+    # Written to /proc directly: echo is a builtin, sysctl a fork
+    "# Disable IPv6 to prevent leaks\n"
+    "echo 1 > /proc/sys/net/ipv6/conf/all/disable_ipv6\n"
+    "echo 1 > /proc/sys/net/ipv6/conf/default/disable_ipv6\n\n"
+)
+# One `ip -batch` process does every netlink operation instead of an `ip`
+# fork per command. Without -force the batch stops at the first error,
+# which set -e then reports. CRITICAL: the explicit route to the SSH host
+# avoids a connection loop; the two /1 routes send all other traffic
+# through the tunnel.
+SETUP_TUN_TEMPLATE = (
+    "# Setup TUN device and routing\n"
+    "ip -batch - <<'EOF'\n"
+    "tuntap add dev tun0 mode tun\n"
+    "addr add 10.0.0.1/24 dev tun0\n"
+    "link set dev tun0 up\n"
+    "route add {route}\n"
+    "route add 0.0.0.0/1 dev tun0\n"
+    "route add 128.0.0.0/1 dev tun0\n"
+    "EOF\n"
+)
+SETUP_DNS_RESOLVED_TEMPLATE = (
+    "resolvectl dns {interface} {servers}\n"
+    "resolvectl domain {interface} '~.'\n\n"
+)
+# Quoted heredoc: written verbatim, no echo -e escapes or shell quoting.
+# Written in place (no rename) so a symlinked resolv.conf stays a symlink
+SETUP_DNS_LEGACY_TEMPLATE = "cat > /etc/resolv.conf <<'RESOLV'\n{resolv_text}\nRESOLV\n\n"
+SETUP_DNS_BACKUP = f"cp /etc/resolv.conf {RESOLV_BACKUP}\n"
+SETUP_DNS_UNCHANGED = f"rm -f {RESOLV_BACKUP}\n\n"
+CLEANUP_SCRIPT_HEAD = (
+    "#!/bin/bash\n"  # Don't use set -e, we want to try every command
+    "{sweep}"
+    "# Kill leftover processes by name only when their PIDs are unknown\n"
+    f"[ -z \"$sweep\" ] || pkill -f '{VPN_PROCESS_PATTERN}' || true\n\n"
+    "# Remove TUN device and routes (-force: keep going past errors)\n"
+    "ip -force -batch - <<'EOF' || true\n"
+    "link set tun0 down\n"
+    "tuntap del dev tun0 mode tun\n"
+    "EOF\n\n"
+)
+CLEANUP_DNS_RESOLVED_TEMPLATE = "resolvectl revert {interface} || true\n"
+# cp writes through a symlinked /etc/resolv.conf (mv would replace the
+# link); the write is skipped entirely when nothing changed. Checks for the
+# backup itself, so the same text works whether or not setup made one.
+CLEANUP_DNS_LEGACY = (
+    f"if [ -f {RESOLV_BACKUP} ]; then\n"
+    f"    cmp -s {RESOLV_BACKUP} /etc/resolv.conf || cp {RESOLV_BACKUP} /etc/resolv.conf || true\n"
+    f"    rm -f {RESOLV_BACKUP} || true\n"
+    "fi\n"
+)
+CLEANUP_SCRIPT_TAIL = (
+    "\n# Re-enable IPv6\n"
+    "echo 0 > /proc/sys/net/ipv6/conf/all/disable_ipv6 || true\n"
+    "echo 0 > /proc/sys/net/ipv6/conf/default/disable_ipv6 || true\n"
+)
+
+# Set once setup has touched the network, cleared by a successful cleanup;
+# the exit handler only asks for root when there is something to undo
+_NETWORK_DIRTY = False
 
 # --- Helper for running scripts with root ---
+# Escalation tool that last worked ('pkexec' or 'sudo'); decided on first use
+_PRIVESC = None
+
 def _run_sudo_script(script_content, log_callback):
     """Tries to run a script with pkexec, falling back to sudo."""
+    global _PRIVESC
     log = log_callback or print
-    cmd = ['bash', '-c', script_content]
+    if _PRIVESC is None:
+        # pkexec is often preferred for GUI apps; without it, don't fork a doomed attempt
+        _PRIVESC = 'pkexec' if shutil.which('pkexec') else 'sudo'
+    first = _PRIVESC
     
     try:
-        # pkexec is often preferred for GUI apps
-        log("Attempting to run network script with pkexec...")
-        subprocess.run(['pkexec'] + cmd, check=True, timeout=30, capture_output=True, text=True)
-        log("✅ pkexec script execution successful.")
+        log(f"Attempting to run network script with {first}...")
+        _run_privileged(first, script_content)
+        log(f"✅ {first} script execution successful.")
         return True
     except (FileNotFoundError, subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
-        log(f"pkexec failed: {e.stderr if hasattr(e, 'stderr') else e}. Falling back to sudo.")
+        second = 'sudo' if first == 'pkexec' else 'pkexec'
+        log(f"{first} failed: {e.stderr if hasattr(e, 'stderr') else e}. Falling back to {second}.")
         try:
-            # Fallback for systems without pkexec or if it fails
-            log("Attempting to run network script with sudo...")
-            subprocess.run(['sudo', 'bash'], input=script_content, check=True, timeout=30, capture_output=True, text=True)
-            log("✅ sudo script execution successful.")
+            log(f"Attempting to run network script with {second}...")
+            _run_privileged(second, script_content)
+            log(f"✅ {second} script execution successful.")
+            _PRIVESC = second  # Try the one that worked first next time
             return True
-        except Exception as e_sudo:
-            stderr = e_sudo.stderr if hasattr(e_sudo, 'stderr') else "(no stderr)"
-            log(f"❌ sudo script also failed: {e_sudo}. Stderr: {stderr}")
+        except Exception as e_second:
+            stderr = e_second.stderr if hasattr(e_second, 'stderr') else "(no stderr)"
+            log(f"❌ {second} script also failed: {e_second}. Stderr: {stderr}")
             return False
 
+# Setup followed by cleanup in one root shell: after setup it reports READY
+# on the original stdout (fd 3) and blocks reading stdin. Closing our end of
+# the pipe - on disconnect, or because the app died - runs the cleanup, so
+# a session asks for root once instead of once per direction.
+ROOT_SESSION_TEMPLATE = (
+    "exec 3>&1 1>&2\n"
+    "{setup}"
+    "echo READY >&3\n"
+    # Anything but an explicit "keep" - EOF because the app died included -
+    # means the helpers may still be running, so kill them by name
+    "read -r reply || true\n"
+    "[ \"$reply\" = keep ] || sweep=1\n"
+    "set +e\n"
+    "{cleanup}"
+)
+
+# Seconds to wait for the root session's setup (includes the password prompt)
+ROOT_SESSION_TIMEOUT = 30
+
+def _start_root_session(setup_script, cleanup_script, log):
+    """Run setup_script as root in a shell that stays to run cleanup_script.
+
+    Returns the session's Popen after setup succeeded, or None.
+    """
+    global _PRIVESC
+    if _PRIVESC is None:
+        _PRIVESC = 'pkexec' if shutil.which('pkexec') else 'sudo'
+    script = ROOT_SESSION_TEMPLATE.format(setup=setup_script, cleanup=cleanup_script)
+    for tool in (_PRIVESC, 'sudo' if _PRIVESC == 'pkexec' else 'pkexec'):
+        log(f"Attempting to run network script with {tool}...")
+        try:
+            proc = subprocess.Popen([tool, 'bash', '-c', script], stdin=subprocess.PIPE,
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        except FileNotFoundError as e:
+            log(f"{tool} failed: {e}.")
+            continue
+        ready, _, _ = select.select([proc.stdout], [], [], ROOT_SESSION_TIMEOUT)
+        if ready and proc.stdout.readline() == 'READY\n':
+            log(f"✅ {tool} script execution successful.")
+            _PRIVESC = tool
+            return proc
+        try:
+            proc.kill()
+        except PermissionError:
+            pass  # Already running as root; the EOF below makes it clean up and exit
+        try:
+            # Closes stdin, so a root shell that did get this far runs its cleanup
+            _, err = proc.communicate(timeout=ROOT_SESSION_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            err = ''
+        reason = err.strip() or (f"exit code {proc.returncode}" if ready else "timed out")
+        log(f"{tool} failed: {reason}.")
+    log("❌ Network setup failed with both pkexec and sudo.")
+    return None
+
+def _end_root_session(proc, log, sweep=False):
+    """Let a root session run its cleanup; True if it finished cleanly."""
+    try:
+        # Also drains stderr, which nothing reads while the session waits
+        _, err = proc.communicate(None if sweep else 'keep\n', timeout=ROOT_SESSION_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        log(f"Root session cleanup did not finish: {e}")
+        return False
+    if proc.returncode != 0:
+        log(f"Root session cleanup failed (exit code {proc.returncode}). Stderr: {err.strip()}")
+        return False
+    return True
+
+def _run_privileged(tool, script_content):
+    # Only stderr is ever reported, so stdout needs no pipe
+    output = dict(stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if tool == 'pkexec':
+        subprocess.run(['pkexec', 'bash', '-c', script_content], check=True, timeout=30, text=True, **output)
+    else:
+        subprocess.run(['sudo', 'bash'], input=script_content, check=True, timeout=30, text=True, **output)
+
 # --- DNS Management Helpers ---
+@functools.lru_cache(maxsize=1)
 def _uses_systemd_resolved():
-    """Check if systemd-resolved is active."""
-    return os.path.exists('/usr/bin/resolvectl') and subprocess.run(['pidof', 'systemd-resolved'], capture_output=True).stdout.strip()
+    """Check if systemd-resolved is active (once per process)."""
+    # The service's runtime directory only exists while it runs, so no pidof fork
+    return os.path.exists('/usr/bin/resolvectl') and os.path.isdir('/run/systemd/resolve')
+
+def _route_get(dst):
+    """Route the kernel picks for dst, as (`ip route add` arguments, device)."""
+    if IPRoute is not None:
+        try:
+            with IPRoute() as ipr:
+                route = ipr.route('get', dst=dst)[0]
+                dev = ipr.get_links(route.get_attr('RTA_OIF'))[0].get_attr('IFLA_IFNAME')
+            gateway = route.get_attr('RTA_GATEWAY')
+            return f"{dst} via {gateway} dev {dev}" if gateway else f"{dst} dev {dev}", dev
+        except Exception:
+            pass  # Fall back to the ip command
+    # Example output: "1.1.1.1 via 192.168.1.1 dev eth0 src 192.168.1.100 uid 1000"
+    output = subprocess.check_output(['ip', 'route', 'get', dst], text=True).strip()
+    parts = output.split()
+    route = ' '.join(parts[:parts.index('src')]) if 'src' in parts else output
+    dev = parts[parts.index('dev') + 1] if 'dev' in parts else None
+    return route, dev
 
 def _get_default_interface():
     """Get the default network interface device name."""
     try:
         # First, try the specific route method, which is often more accurate
         # for complex routing tables (e.g., multiple default routes).
-        result = subprocess.run(
-            ['ip', 'route', 'get', '1.1.1.1'],
-            check=True, capture_output=True, text=True
-        )
-        # Example output: "1.1.1.1 via 192.168.1.1 dev eth0 src 192.168.1.100 uid 1000"
-        parts = result.stdout.strip().split()
-        if 'dev' in parts:
-            return parts[parts.index('dev') + 1]
+        dev = _route_get('1.1.1.1')[1]
+        if dev:
+            return dev
     except (subprocess.CalledProcessError, FileNotFoundError):
-        # If the first method fails, fall back to parsing the main routing table.
+        # If the first method fails, fall back to the kernel's IPv4 routing
+        # table; default routes have an all-zero destination and mask
         try:
-            result = subprocess.run(
-                ['ip', 'route'],
-                check=True, capture_output=True, text=True
-            )
-            # Find the line starting with 'default'
-            for line in result.stdout.splitlines():
-                if line.startswith('default'):
-                    parts = line.split()
-                    if 'dev' in parts:
-                        return parts[parts.index('dev') + 1]
-        except (subprocess.CalledProcessError, FileNotFoundError):
+            with open('/proc/net/route') as f:
+                next(f)  # Header
+                for line in f:
+                    fields = line.split()
+                    if fields[1] == '00000000' and fields[7] == '00000000':
+                        return fields[0]
+        except (OSError, StopIteration, IndexError):
             return None # Both methods failed
     return None
 
+def _resolve(host):
+    """IPv4 address for host, reused for DNS_CACHE_TTL seconds across reconnects."""
+    try:
+        if ipaddress.ip_address(host).version == 4:
+            return host  # Already a literal: nothing to look up
+    except ValueError:
+        pass
+    cached = _DNS_CACHE.get(host)
+    if cached and time.monotonic() - cached[0] < DNS_CACHE_TTL:
+        return cached[1]
+    # IPv4 only: the setup script disables IPv6 and routes the host over it
+    address = socket.getaddrinfo(host, None, socket.AF_INET, socket.SOCK_STREAM)[0][4][0]
+    _DNS_CACHE[host] = (time.monotonic(), address)
+    return address
+
+# --- SSH connection pool ---
+def _pool_key(host, port, username, auth_method, password, ssh_key_path):
+    """Pool key; includes a digest of the credential, so a changed password
+    or key file never reuses a client that logged in with the old one."""
+    if auth_method == "SSH Key":
+        path = os.path.expanduser(ssh_key_path)
+        try:
+            st = os.stat(path)
+            credential = f"{path}\0{st.st_size}\0{st.st_mtime_ns}"
+        except OSError:
+            credential = path
+    else:
+        credential = password or ''
+    digest = hashlib.sha256(credential.encode()).hexdigest()
+    return (host, int(port), username, auth_method, digest)
+
+def _schedule_pool_expire(delay):
+    """Arm the one expiry timer unless it is already pending; needs _SSH_POOL_LOCK."""
+    global _POOL_TIMER
+    if _POOL_TIMER is None:
+        _POOL_TIMER = threading.Timer(delay, _pool_expire)
+        _POOL_TIMER.daemon = True
+        _POOL_TIMER.start()
+
+def _pool_expire():
+    """Close pooled clients that sat unused for SSH_POOL_TTL seconds."""
+    global _POOL_TIMER
+    now = time.monotonic()
+    with _SSH_POOL_LOCK:
+        _POOL_TIMER = None
+        expired = [key for key, (pooled, _) in _SSH_POOL.items() if now - pooled >= SSH_POOL_TTL]
+        clients = [_SSH_POOL.pop(key)[1] for key in expired]
+        if _SSH_POOL:
+            # Come back when the oldest remaining entry is due
+            oldest = min(pooled for pooled, _ in _SSH_POOL.values())
+            _schedule_pool_expire(max(0, oldest + SSH_POOL_TTL - now))
+    for ssh in clients:
+        ssh.close()
+
+def _pool_put(key, ssh):
+    with _SSH_POOL_LOCK:
+        old = _SSH_POOL.pop(key, None)
+        _SSH_POOL[key] = (time.monotonic(), ssh)
+        # Don't leave an authenticated session open for the life of the process
+        _schedule_pool_expire(SSH_POOL_TTL)
+    if old is not None:
+        old[1].close()
+
+def _pool_forget(key, ssh):
+    """Drop ssh from the pool without closing it: the caller now owns it."""
+    with _SSH_POOL_LOCK:
+        if _SSH_POOL.get(key, (None, None))[1] is ssh:
+            del _SSH_POOL[key]
+
+def _pool_take(key):
+    """Remove and return a pooled client whose transport is still alive, or None."""
+    with _SSH_POOL_LOCK:
+        pooled, ssh = _SSH_POOL.pop(key, (None, None))
+    if ssh is None:
+        return None
+    if time.monotonic() - pooled >= SSH_POOL_TTL:
+        ssh.close()
+        return None
+    transport = ssh.get_transport()
+    try:
+        if transport is None or not transport.is_active():
+            raise EOFError
+        transport.send_ignore()  # Cheap liveness check; raises if the socket died
+    except Exception:
+        ssh.close()
+        return None
+    return ssh
+
+@atexit.register
+def _close_pool():
+    with _SSH_POOL_LOCK:
+        clients = [ssh for _, ssh in _SSH_POOL.values()]
+        _SSH_POOL.clear()
+    for ssh in clients:
+        ssh.close()
+
+def _stop_socks(vpn_info):
+    server = vpn_info.get("socks_server") if vpn_info else None
+    if server is not None:
+        server.stop()
+
 # --- Main Public Functions ---
 
 def create_tun_vpn(host, port, username, auth_method, password, ssh_key_path, udpgw_port=7300, dns_servers='8.8.8.8, 8.8.4.4', log_callback=None):
     """
     Creates the full VPN tunnel: sets up network, starts proxies, and returns process info.
     This version bundles all privileged operations into a single script.
+    The SOCKS proxy runs in-process on the SSH connection test_ssh_connection left in the pool.
     """
+    global _NETWORK_DIRTY
     log = log_callback or print
     systemd_interface = None # Define here for cleanup scope
+    ssh = socks_server = root_session = None
+    processes = []
 
     try:
         log(f"Creating tun2socks VPN (UDP Gateway: {udpgw_port})...")
         
-        # 1. Resolve host and determine route BEFORE building script
-        try:
-            host_ip = socket.gethostbyname(host)
-            log(f"Resolved SSH host '{host}' to IP '{host_ip}'")
-        except socket.gaierror:
-            raise RuntimeError(f"Could not resolve host: {host}")
+        # 1. Get the logged-in SSH client first (pooled by test_ssh_connection),
+        # so the host route below is for the address its transport actually
+        # reached, not a possibly different answer from a fresh lookup
+        key = _pool_key(host, port, username, auth_method, password, ssh_key_path)
+        ssh = _pool_take(key)
+        if ssh is None:
+            # Nothing pooled (or it dropped): log in once more
+            client = test_ssh_connection(host, int(port), username, auth_method, password, ssh_key_path, log)
+            if not client:
+                raise RuntimeError("SSH SOCKS proxy failed to start. Check credentials and connectivity.")
+            _pool_forget(key, client)
+            ssh = client
+        transport = ssh.get_transport()
+        host_ip = transport.getpeername()[0]
+        log(f"SSH host '{host}' is connected at IP '{host_ip}'")
 
-        route_cmd_output = subprocess.check_output(['ip', 'route', 'get', host_ip], text=True).strip()
-        parts = route_cmd_output.split()
-        try:
-            src_index = parts.index('src')
-            route_to_add = ' '.join(parts[:src_index])
-        except ValueError:
-            route_to_add = route_cmd_output
+        # route_dev is the uplink the SSH host is reached through; reusing it
+        # saves a second route lookup for resolvectl
+        route_to_add, route_dev = _route_get(host_ip)
         log(f"Found route to host: '{route_to_add}'")
 
         # 2. Build the network setup script
-        setup_script = "#!/bin/bash\nset -e\n\n"
+        # Collected as parts and joined once
+        setup_parts = [SETUP_SCRIPT_HEAD]
         log("Building network setup script...")
 
-        # Disable IPv6
-        setup_script += "# Disable IPv6 to prevent leaks\n"
-        setup_script += "sysctl -w net.ipv6.conf.all.disable_ipv6=1\n"
-        setup_script += "sysctl -w net.ipv6.conf.default.disable_ipv6=1\n\n"
-
         # Configure DNS
         dns_list = [dns.strip() for dns in dns_servers.split(',') if dns.strip()]
         if dns_list:
-            setup_script += "# Configure DNS\n"
+            setup_parts.append("# Configure DNS\n")
             if _uses_systemd_resolved():
-                interface = _get_default_interface()
+                interface = route_dev or _get_default_interface()
                 if interface:
                     systemd_interface = interface
-                    dns_str = ' '.join(dns_list)
-                    setup_script += f"resolvectl dns {interface} {dns_str}\n"
-                    setup_script += f"resolvectl domain {interface} '~.'\n\n"
+                    setup_parts.append(SETUP_DNS_RESOLVED_TEMPLATE.format(
+                        interface=interface, servers=' '.join(dns_list)))
                     log(f"Script will use systemd-resolved on interface '{interface}'")
                 else:
                     log("Warning: Could not determine default interface for resolvectl. DNS may not be set.")
             else:
                 log("Script will use legacy /etc/resolv.conf method for DNS")
-                if os.path.exists('/etc/resolv.conf'):
-                    setup_script += f"cp /etc/resolv.conf {RESOLV_BACKUP}\n"
                 dns_text = '\n'.join(f'nameserver {d}' for d in dns_list)
-                setup_script += f"echo -e '{dns_text}' > /etc/resolv.conf\n\n"
+                try:
+                    with open('/etc/resolv.conf') as f:
+                        current = f.read()
+                except OSError:
+                    current = None
+                if current == dns_text + '\n':
+                    # Already what we would write: no backup, no write, nothing to restore
+                    log("/etc/resolv.conf already lists these servers; leaving it alone")
+                    setup_parts.append(SETUP_DNS_UNCHANGED)
+                else:
+                    if current is not None:
+                        setup_parts.append(SETUP_DNS_BACKUP)
+                    setup_parts.append(SETUP_DNS_LEGACY_TEMPLATE.format(resolv_text=dns_text))
 
         # Setup TUN device and routing
-        setup_script += "# Setup TUN device and routing\n"
-        setup_script += "ip tuntap add dev tun0 mode tun\n"
-        setup_script += "ip addr add 10.0.0.1/24 dev tun0\n"
-        setup_script += "ip link set dev tun0 up\n"
-        
-        # CRITICAL: Add explicit route to SSH host to avoid connection loop
-        setup_script += f"# Add explicit route for SSH host to prevent loop\n"
-        setup_script += f"ip route add {route_to_add}\n\n"
-        
-        # Route all other traffic through the tunnel
-        setup_script += "# Route all other traffic through the tunnel\n"
-        setup_script += "ip route add 0.0.0.0/1 dev tun0\n"
-        setup_script += "ip route add 128.0.0.0/1 dev tun0\n"
+        setup_parts.append(SETUP_TUN_TEMPLATE.format(route=route_to_add))
+        setup_script = ''.join(setup_parts)
         
-        # 3. Execute the setup script with root privileges
+        # 3. Execute the setup script with root privileges; the same root
+        # shell then waits to run the cleanup on disconnect
         log("Requesting root permissions for all network setup tasks...")
-        if not _run_sudo_script(setup_script, log):
+        _NETWORK_DIRTY = True  # Even a failed setup may have changed something
+        root_session = _start_root_session(setup_script, _cleanup_script(systemd_interface, log), log)
+        if root_session is None:
             raise RuntimeError("Failed to execute network setup script. Check logs for details.")
         
-        # 4. Start SOCKS proxy (as current user)
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        ssh_script = os.path.join(script_dir, 'ssh_socks_simple.py')
-        if not os.path.exists(ssh_script):
-            ssh_script = '/usr/local/lib/ssh-vpn-pro/ssh_socks_simple.py'
-
-        cmd = ['python3', '-u', ssh_script, host, str(port), username]
-        if auth_method == "SSH Key":
-            cmd.extend([os.path.expanduser(ssh_key_path), '1080', 'key'])
-        else:
-            cmd.extend([password, '1080', 'password'])
-
-        socks_log = f'/tmp/vpn_socks_{os.getpid()}.log'
-        with open(socks_log, 'w') as log_file:
-            ssh_process = subprocess.Popen(cmd, stdout=log_file, stderr=log_file)
-        log(f"SSH SOCKS proxy started (PID: {ssh_process.pid})")
-
-        time.sleep(3) # Wait for SOCKS proxy to be ready
-        if ssh_process.poll() is not None:
-             raise RuntimeError("SSH SOCKS proxy failed to start. Check credentials and connectivity.")
+        # 4. Start SOCKS proxy (in-process, on the already authenticated transport)
+        transport.set_keepalive(10)
+        # Window/packet size advertised on every channel opened from here on
+        transport.default_window_size = ssh_socks_simple.DEFAULT_WINDOW_SIZE
+        transport.default_max_packet_size = ssh_socks_simple.BUF
+
+        socks_server = ssh_socks_simple.forward_tunnel(SOCKS_PORT, host, port, transport)
+        socks_server.daemon = True  # Must not keep the GUI alive on exit
+        socks_server.start()
+
+        # Wait for our own listener to be bound. A connect probe would also
+        # pass for a foreign proxy already on the port (e.g. a leftover one)
+        if not socks_server.ready.wait(3) or socks_server.bind_error or not socks_server.is_alive():
+            reason = socks_server.bind_error or "listener not ready"
+            raise RuntimeError(f"SSH SOCKS proxy failed to start on port {SOCKS_PORT}: {reason}")
+        log(f"SSH SOCKS proxy listening on 127.0.0.1:{SOCKS_PORT}")
 
         # 5. Start tun2socks and udpgw (as current user)
         tun_cmd = [
             'badvpn-tun2socks', '--tundev', 'tun0', '--netif-ipaddr', '10.0.0.2',
-            '--netif-netmask', '255.255.255.0', '--socks-server-addr', '127.0.0.1:1080',
+            '--netif-netmask', '255.255.255.0', '--socks-server-addr', f'127.0.0.1:{SOCKS_PORT}',
             '--udpgw-server-addr', f'127.0.0.1:{udpgw_port}'
         ]
         udpgw_cmd = ['badvpn-udpgw', '--listen-addr', f'127.0.0.1:{udpgw_port}']
 
-        tunnel_proc = subprocess.Popen(tun_cmd, preexec_fn=os.setsid)
-        udpgw_proc = subprocess.Popen(udpgw_cmd, preexec_fn=os.setsid)
+        tunnel_proc = subprocess.Popen(tun_cmd, start_new_session=True)
+        processes.append(tunnel_proc)
+        udpgw_proc = subprocess.Popen(udpgw_cmd, start_new_session=True)
+        processes.append(udpgw_proc)
+        _wait_helpers_ready(tunnel_proc, udpgw_proc, udpgw_port, log)
 
         log("✅ VPN tunnel established successfully.")
         return True, {
-            "ssh_proc": ssh_process,
-            "tunnel_proc": tunnel_proc,
-            "udpgw_proc": udpgw_proc,
+            "processes": processes,
+            "socks_server": socks_server,
+            "root_session": root_session,
             "systemd_interface": systemd_interface
         }
     except Exception as e:
         log(f"❌ create_tun_vpn failed: {e}")
-        cleanup_network({"systemd_interface": systemd_interface}, log) # Attempt cleanup
+        if socks_server is None and ssh is not None:
+            ssh.close()
+        cleanup_network({"processes": processes, "socks_server": socks_server,
+                         "root_session": root_session, "systemd_interface": systemd_interface}, log) # Attempt cleanup
         return False, None
 
+def _cleanup_script(systemd_interface, log, sweep=False):
+    """Cleanup script text: only the DNS section and the pkill sweep vary."""
+    cleanup_parts = [CLEANUP_SCRIPT_HEAD.format(sweep="sweep=1\n" if sweep else ""),
+                     "# Revert DNS changes\n"]
+    if systemd_interface and _uses_systemd_resolved():
+        log(f"Script will revert DNS on interface '{systemd_interface}'")
+        cleanup_parts.append(CLEANUP_DNS_RESOLVED_TEMPLATE.format(interface=systemd_interface))
+    else:
+        log("Script will attempt to restore /etc/resolv.conf from backup")
+        cleanup_parts.append(CLEANUP_DNS_LEGACY)
+    cleanup_parts.append(CLEANUP_SCRIPT_TAIL)
+    return ''.join(cleanup_parts)
+
 def cleanup_network(vpn_info, log_callback=None):
     """Cleans up all network changes and kills VPN processes using a single sudo script."""
+    global _NETWORK_DIRTY
     log = log_callback or print
     log("🧹 Cleaning up network connection...")
 
-    # 1. Kill user-space processes
-    for proc_name in ["ssh_proc", "tunnel_proc", "udpgw_proc"]:
-        if vpn_info and proc_name in vpn_info and vpn_info[proc_name]:
-            try:
-                os.killpg(os.getpgid(vpn_info[proc_name].pid), signal.SIGTERM)
-                log(f"Terminated {proc_name} (PID: {vpn_info[proc_name].pid})")
-            except Exception as e:
-                log(f"Could not terminate {proc_name}: {e}")
-    
-    # 2. Build and run cleanup script
-    cleanup_script = "#!/bin/bash\n" # Don't use set -e, we want to try every command
-    
-    cleanup_script += "# Kill any leftover processes\n"
-    cleanup_script += "pkill -f 'badvpn-tun2socks' || true\n"
-    cleanup_script += "pkill -f 'badvpn-udpgw' || true\n"
-    cleanup_script += "pkill -f 'ssh_socks_simple.py' || true\n\n"
-    
-    cleanup_script += "# Remove TUN device and routes\n"
-    cleanup_script += "ip link set tun0 down || true\n"
-    cleanup_script += "ip tuntap del dev tun0 mode tun || true\n\n"
+    # 1. Stop the in-process SOCKS proxy (closes its SSH connection), then
+    # kill user-space processes: signal them all, then reap them together
+    _stop_socks(vpn_info)
+    processes = vpn_info.get("processes", []) if vpn_info else []
+    # Without a process list (e.g. exit cleanup after a crash) fall back to pkill
+    sweep = not vpn_info or "processes" not in vpn_info
+    for proc in processes:
+        try:
+            os.killpg(proc.pid, signal.SIGTERM)
+            log(f"Terminated {proc.args[0]} (PID: {proc.pid})")
+        except Exception as e:
+            log(f"Could not terminate {proc.args[0]}: {e}")
+    _reap_processes(processes, 3, log)
     
-    cleanup_script += "# Revert DNS changes\n"
-    systemd_interface = vpn_info.get("systemd_interface") if vpn_info else None
-    if systemd_interface and _uses_systemd_resolved():
-        log(f"Script will revert DNS on interface '{systemd_interface}'")
-        cleanup_script += f"resolvectl revert {systemd_interface} || true\n"
+    # 2. Run the cleanup script: in the root shell that did the setup when it
+    # is still waiting (no new prompt), otherwise with a fresh pkexec/sudo
+    root_session = vpn_info.get("root_session") if vpn_info else None
+    if root_session is not None and root_session.poll() is None:
+        log("Handing cleanup to the root session that did the setup...")
+        ok = _end_root_session(root_session, log, sweep)
     else:
-        log("Script will attempt to restore /etc/resolv.conf from backup")
-        if os.path.exists(RESOLV_BACKUP):
-            cleanup_script += f"cp {RESOLV_BACKUP} /etc/resolv.conf || true\n"
-            cleanup_script += f"rm -f {RESOLV_BACKUP} || true\n"
-    
-    cleanup_script += "\n# Re-enable IPv6\n"
-    cleanup_script += "sysctl -w net.ipv6.conf.all.disable_ipv6=0 || true\n"
-    cleanup_script += "sysctl -w net.ipv6.conf.default.disable_ipv6=0 || true\n"
-
-    log("Requesting root permissions for all network cleanup tasks...")
-    if not _run_sudo_script(cleanup_script, log):
+        systemd_interface = vpn_info.get("systemd_interface") if vpn_info else None
+        log("Requesting root permissions for all network cleanup tasks...")
+        ok = _run_sudo_script(_cleanup_script(systemd_interface, log, sweep), log)
+    if not ok:
         log("❌ Network cleanup script failed. Manual cleanup may be required.")
     else:
+        _NETWORK_DIRTY = False
         log("✅ Network cleanup complete.")
 
-def test_ssh_connection(host, port, username, auth_method, password, ssh_key_path, log_callback=None):
+def test_ssh_connection(host, port, username, auth_method, password, ssh_key_path, log_callback=None, retry_for=0):
+    """Check that we can log in. Transport errors are retried with exponential
+    backoff for up to retry_for seconds (e.g. while stunnel's TLS leg comes up);
+    authentication failures are never retried. On success the connected client
+    is kept in the pool for create_tun_vpn and also returned."""
     log = log_callback or print
-    try:
-        log(f"🔌 Attempting SSH: {username}@{host}:{port}")
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        key_path = os.path.expanduser(ssh_key_path)
-
-        if auth_method == "SSH Key":
-            if not os.path.exists(key_path):
-                log(f"❌ SSH key file not found: {key_path}")
-                return False
-            ssh.connect(host, port=port, username=username, key_filename=key_path, timeout=10)
-        else:
-            ssh.connect(host, port=port, username=username, password=password, timeout=10)
-        
-        ssh.close()
-        log("✅ SSH connection successful")
-        return True
-    except Exception as e:
-        log(f"❌ SSH connection failed: {type(e).__name__}: {str(e)}")
+    key_path = os.path.expanduser(ssh_key_path)
+    if auth_method == "SSH Key" and not os.path.exists(key_path):
+        log(f"❌ SSH key file not found: {key_path}")
         return False
+    pkey = None
+    if auth_method == "SSH Key":
+        # One read and one parse up front, instead of paramiko trying each
+        # key class on every retry
+        try:
+            pkey = ssh_socks_simple.load_private_key(key_path)
+        except Exception as e:
+            log(f"❌ Could not load SSH key: {e}")
+            return False
+
+    # An earlier test that create_tun_vpn never consumed is still logged in
+    pool_key = _pool_key(host, port, username, auth_method, password, ssh_key_path)
+    ssh = _pool_take(pool_key)
+    if ssh is not None:
+        _pool_put(pool_key, ssh)
+        log(f"✅ Reusing SSH connection to {username}@{host}:{port}")
+        return ssh
+
+    deadline = time.monotonic() + retry_for
+    delay = 0.25
+    while True:
+        try:
+            log(f"🔌 Attempting SSH: {username}@{host}:{port}")
+            ssh = paramiko.SSHClient()
+            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            # Only the configured credential: no agent or ~/.ssh probing before
+            # it, and a dead server or wrong password fails within seconds.
+            # The cached address is the one create_tun_vpn routes around tun0
+            options = dict(port=port, username=username, timeout=10, banner_timeout=5,
+                           auth_timeout=5, allow_agent=False, look_for_keys=False)
+            try:
+                if auth_method == "SSH Key":
+                    ssh.connect(_resolve(host), pkey=pkey, **options)
+                else:
+                    ssh.connect(_resolve(host), password=password, **options)
+            except BaseException:
+                ssh.close()
+                raise
+            _pool_put(pool_key, ssh)
+            log("✅ SSH connection successful")
+            return ssh
+        except paramiko.AuthenticationException as e:
+            log(f"❌ SSH connection failed: {type(e).__name__}: {str(e)}")
+            return False
+        except Exception as e:
+            if time.monotonic() + delay > deadline:
+                log(f"❌ SSH connection failed: {type(e).__name__}: {str(e)}")
+                return False
+            log(f"⏳ SSH not ready ({type(e).__name__}), retrying in {delay:.2f}s")
+            time.sleep(delay)
+            delay *= 2
+
+# TCP state code for LISTEN in /proc/net/tcp
+PROC_TCP_LISTEN = '0A'
+
+def _proc_net_address(ip):
+    """ip as /proc/net/tcp{,6} prints it: each 32-bit word in host byte order."""
+    packed = socket.inet_pton(socket.AF_INET6 if ':' in ip else socket.AF_INET, ip)
+    return ''.join('%08X' % word for word in struct.unpack(f'={len(packed) // 4}I', packed))
+
+# Local addresses a loopback client can reach: loopback and wildcard, v4 and v6
+PROC_LOOPBACK_ADDRESSES = {
+    'tcp': {_proc_net_address('127.0.0.1'), _proc_net_address('0.0.0.0')},
+    'tcp6': {_proc_net_address('::1'), _proc_net_address('::')},
+}
+
+def _tcp_listen_ports():
+    """Ports with a loopback-reachable TCP listener, read from /proc/net/tcp{,6} (no ss fork)."""
+    ports = set()
+    for table, addresses in PROC_LOOPBACK_ADDRESSES.items():
+        try:
+            f = open(f'/proc/net/{table}')
+        except FileNotFoundError:
+            continue  # No IPv6
+        with f:
+            next(f)  # Header
+            for line in f:
+                fields = line.split(None, 4)
+                if fields[3] == PROC_TCP_LISTEN:
+                    address, _, port = fields[1].partition(':')
+                    if address in addresses:
+                        ports.add(int(port, 16))
+    return ports
 
 def check_udpgw_status(udpgw_port=7300):
     """Checks if the UDP gateway is listening on its port."""
+    # Reading the socket table is preferred: a connect would show up as a
+    # (short-lived) client on udpgw every time the stats timer fires
     try:
-        result = subprocess.run(['ss', '-tuln'], capture_output=True, text=True, timeout=2)
-        return f'127.0.0.1:{udpgw_port}' in result.stdout
-    except FileNotFoundError:
-        # Fallback for systems without 'ss'
-        try:
-            result = subprocess.run(['netstat', '-tuln'], capture_output=True, text=True, timeout=2)
-            return f'127.0.0.1:{udpgw_port}' in result.stdout
-        except Exception:
-            return False # Cannot determine status
-    except Exception:
+        return udpgw_port in _tcp_listen_ports()
+    except OSError:
+        pass  # No procfs: fall back to a loopback connect instead of forking ss
+    try:
+        return _port_accepting(udpgw_port)
+    except OSError:
         return False
 
 def create_stunnel_config(host, tls_port, sni_domain):
-    """Creates a temporary stunnel config file."""
+    """Creates a temporary stunnel config file and returns it with the local port."""
+    # Reserve a free loopback port up front so readiness can be probed by
+    # connecting to it instead of asking ss which port stunnel picked
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        local_port = s.getsockname()[1]
     config_content = f"""
 foreground = yes
 pid = 
 client = yes
 [ssh]
-accept = 127.0.0.1:0
+accept = 127.0.0.1:{local_port}
 connect = {host}:{tls_port}
 sni = {sni_domain}
 """
     config_path = f'/tmp/stunnel_config_{os.getpid()}.conf'
     with open(config_path, 'w') as f:
         f.write(config_content)
-    return config_path, None 
+    return config_path, local_port
+
+def _proc_listen_port(pid):
+    """Loopback TCP port process pid listens on, from procfs, or None if not bound yet."""
+    inodes = set()
+    for fd in os.listdir(f'/proc/{pid}/fd'):
+        try:
+            target = os.readlink(f'/proc/{pid}/fd/{fd}')
+        except OSError:
+            continue  # Closed while we looked
+        if target.startswith('socket:['):
+            inodes.add(target[8:-1])
+    for table, addresses in PROC_LOOPBACK_ADDRESSES.items():
+        try:
+            f = open(f'/proc/net/{table}')
+        except FileNotFoundError:
+            continue  # No IPv6
+        with f:
+            next(f)  # Header
+            for line in f:
+                fields = line.split()
+                address, _, port = fields[1].partition(':')
+                if fields[3] == PROC_TCP_LISTEN and fields[9] in inodes and address in addresses:
+                    return int(port, 16)
+    return None
+
+def _stunnel_listen_port(pid):
+    """Local port the given stunnel process listens on, or None if not bound yet."""
+    try:
+        return _proc_listen_port(pid)
+    except OSError:
+        pass  # No procfs: ask ss/netstat instead
+    for tool, owner in (('ss', f'pid={pid},'), ('netstat', f'{pid}/stunnel')):
+        try:
+            res = subprocess.run([tool, '-tlpn'], capture_output=True, text=True, check=True, timeout=2)
+        except Exception:
+            continue  # Try the next tool
+        for line in res.stdout.splitlines():
+            if owner in line and '127.0.0.1' in line:
+                return int(line.split()[3].split(':')[-1])
+        return None
+    raise RuntimeError("neither 'ss' nor 'netstat' is available")
+
+def _port_accepting(port):
+    """True once something on 127.0.0.1 accepts connections on port."""
+    with socket.socket() as s:
+        s.settimeout(0.1)
+        return s.connect_ex(('127.0.0.1', port)) == 0
+
+def _open_pidfd(pid):
+    """pidfd for pid (Linux 5.3+), or None where unsupported."""
+    try:
+        return os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        return None
+
+def _sleep_unless_exited(pidfds, seconds):
+    """Sleep up to seconds, waking as soon as a process behind one of the pidfds exits."""
+    pidfds = [fd for fd in pidfds if fd is not None]
+    if pidfds:
+        select.select(pidfds, [], [], seconds)
+    else:
+        time.sleep(seconds)
+
+# Seconds to wait for SIGKILLed helpers; one stuck in uninterruptible sleep
+# must not hang the disconnect (and with it every later connect or exit)
+KILL_WAIT_TIMEOUT = 2
+
+def _reap_processes(processes, timeout, log):
+    """Wait up to timeout for signalled processes, woken by their pidfds rather
+    than polling each in turn, then SIGKILL whatever is left."""
+    pidfds = {proc: _open_pidfd(proc.pid) for proc in processes}
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            alive = [proc for proc in processes if proc.poll() is None]
+            remaining = deadline - time.monotonic()
+            if not alive or remaining <= 0:
+                break
+            # Without pidfds fall back to short sleeps between polls
+            _sleep_unless_exited([pidfds[proc] for proc in alive], min(remaining, 0.05)
+                                 if None in pidfds.values() else remaining)
+        for proc in alive:
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except OSError:
+                pass
+        deadline = time.monotonic() + KILL_WAIT_TIMEOUT
+        for proc in alive:
+            try:
+                proc.wait(timeout=max(0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                log(f"{proc.args[0]} (PID: {proc.pid}) did not exit after SIGKILL; leaving it")
+    finally:
+        for fd in pidfds.values():
+            if fd is not None:
+                os.close(fd)
+
+def _tun_attached():
+    # tun0 is administratively up already; its operstate leaves "down" once
+    # a process attaches to the device
+    try:
+        with open('/sys/class/net/tun0/operstate') as f:
+            return f.read().strip() in ('up', 'unknown')
+    except FileNotFoundError:
+        return False
+
+def _wait_helpers_ready(tunnel_proc, udpgw_proc, udpgw_port, log, timeout=HELPERS_READY_TIMEOUT):
+    """Wait for tun2socks to open tun0 and udpgw to listen, both in one loop,
+    failing if either exits first."""
+    pending = {'tun0 carrier': _tun_attached,
+               'UDP gateway': lambda: check_udpgw_status(udpgw_port)}
+    procs = (tunnel_proc, udpgw_proc)
+    pidfds = [_open_pidfd(proc.pid) for proc in procs]
+    try:
+        deadline = time.monotonic() + timeout
+        while pending and time.monotonic() < deadline:
+            for proc in procs:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"{proc.args[0]} exited with code {proc.returncode}")
+            for name, ready in list(pending.items()):
+                if ready():
+                    del pending[name]
+            if pending:
+                _sleep_unless_exited(pidfds, 0.05)
+    finally:
+        for pidfd in pidfds:
+            if pidfd is not None:
+                os.close(pidfd)
+    for name in pending:
+        log(f"Warning: {name} not ready yet; the helpers may still be starting.")
+
+def _drain(pipe):
+    """Read and discard pipe until its writer closes it."""
+    for _ in pipe:
+        pass
 
-def start_stunnel(config_path, log_callback):
-    """Starts stunnel and captures the local port it uses."""
+def start_stunnel(config_path, log_callback, local_port=None, timeout=STUNNEL_START_TIMEOUT):
+    """Starts stunnel and waits until its local port accepts connections."""
     log = log_callback or print
     try:
+        # In the foreground stunnel logs to stderr only
         proc = subprocess.Popen(
             ['stunnel', config_path],
-            stdout=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
             stderr=subprocess.PIPE,
             text=True
         )
-        time.sleep(2) # Give stunnel a moment to start and bind
 
-        if proc.poll() is not None:
-            err = proc.stderr.read()
-            log(f"stunnel failed to start. Error: {err}")
-            return None, None
+        # Poll until stunnel is listening (or died), backing off from 25ms.
+        # With a known port a loopback connect is enough; otherwise fall back
+        # to looking the port up with ss/netstat. Between probes we wait on a
+        # pidfd, so a stunnel that exits right away is noticed immediately.
+        pidfd = _open_pidfd(proc.pid)
+        try:
+            deadline = time.monotonic() + timeout
+            delay = 0.025
+            while time.monotonic() < deadline:
+                if proc.poll() is not None:
+                    err = proc.stderr.read()
+                    log(f"stunnel failed to start. Error: {err}")
+                    return None, None
+
+                if local_port:
+                    ready_port = local_port if _port_accepting(local_port) else None
+                else:
+                    try:
+                        ready_port = _stunnel_listen_port(proc.pid)
+                    except RuntimeError as e:
+                        log(f"Could not get stunnel port: {e}")
+                        break
+                if ready_port:
+                    log(f"stunnel is listening on local port: {ready_port}")
+                    # Keep reading its per-connection log lines, or a full
+                    # pipe would eventually block stunnel mid-session
+                    threading.Thread(target=_drain, args=(proc.stderr,), daemon=True).start()
+                    return proc, ready_port
+                _sleep_unless_exited([pidfd], max(0, min(delay, deadline - time.monotonic())))
+                delay = min(delay * 2, 0.25)
+        finally:
+            if pidfd is not None:
+                os.close(pidfd)
 
-        # Find the ephemeral port stunnel is listening on
-        for i in range(5):
-            try:
-                res = subprocess.run(['ss', '-tlpn'], capture_output=True, text=True, check=True)
-                for line in res.stdout.splitlines():
-                    if f'pid={proc.pid}' in line and '127.0.0.1' in line:
-                        local_port = int(line.split()[3].split(':')[-1])
-                        log(f"stunnel is listening on local port: {local_port}")
-                        return proc, local_port
-                time.sleep(1)
-            except Exception as e:
-                log(f"Could not get stunnel port with 'ss': {e}. Trying 'netstat'.")
-                try:
-                    res = subprocess.run(['netstat', '-tlpn'], capture_output=True, text=True, check=True)
-                    for line in res.stdout.splitlines():
-                        if f'{{proc.pid}}/stunnel' in line and '127.0.0.1' in line:
-                            local_port = int(line.split()[3].split(':')[-1])
-                            log(f"stunnel is listening on local port: {local_port}")
-                            return proc, local_port
-                    time.sleep(1)
-                except Exception as e2:
-                    log(f"Could not get stunnel port with 'netstat' either: {e2}")
-        
         log("Could not determine stunnel's local listening port.")
         proc.kill()
         return None, None
@@ -350,6 +884,9 @@ def start_stunnel(config_path, log_callback):
 # Atexit handler for emergency cleanup
 @atexit.register
 def _emergency_cleanup():
+    # Nothing set up this run and no tun0 left over: skip the root prompt
+    if not _NETWORK_DIRTY and not os.path.exists('/sys/class/net/tun0'):
+        return
     print("Emergency cleanup on exit...")
     cleanup_info = {"systemd_interface": None} # Assume we don't know the interface
     cleanup_network(cleanup_info, print)